@@ -0,0 +1,224 @@
+# bench.py
+
+#
+# Benchmarks for the Traveling Salesman Problem genetic algorithms
+#
+# Runs on seeded synthetic instances of several sizes and measures crossover
+# throughput, fitness evaluations per second, generations per second and the
+# time a tournament selection search takes to reach a target tour length.
+# Results are written as JSON, and can be compared against an earlier run
+# to flag regressions:
+#
+#     python bench.py --sizes 100 1000 --out new.json --compare old.json
+#
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+import population
+import tsp
+from crossover import PURE_CROSSOVERS, array_crossover
+from distance import make_distance
+
+SIZES = (100, 1000, 10000, 100000)
+
+# returns n random cities with integer coordinates, like cities1000.txt
+
+
+def synthetic_city_locs(n, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randrange(10 * n), rng.randrange(10 * n)) for i in range(n)]
+
+# calls fn repeatedly for at least min_time seconds, and returns how many
+# times per second it ran; fn is always called at least once
+
+
+def _rate(fn, min_time):
+    count = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+
+def _result(n, metric, name, value, unit, higher_is_better=True):
+    return {'size': n, 'metric': metric, 'name': name, 'value': value,
+            'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def bench_crossovers(n, min_time):
+    s, t = tsp.rand_perm(n), tsp.rand_perm(n)
+    rows = np.array([s, t], dtype=np.int32)
+    out = np.zeros((2, n), dtype=np.int32)
+    results = []
+    # neither kind mutates its children, so both measure only recombination
+    for name, op in PURE_CROSSOVERS.items():
+        rate = _rate(lambda: op(s, t), min_time)
+        results.append(_result(n, 'crossover', name, 2 * rate, 'children/s'))
+    for name in ('my_crossover', 'tpxwr', 'ox'):
+        op = array_crossover(name)
+        rate = _rate(lambda: op(rows[0], rows[1], out[0], out[1]), min_time)
+        results.append(_result(n, 'crossover', name + '_into', 2 * rate,
+                               'children/s'))
+    return results
+
+
+def bench_fitness(n, city_locs, dists, min_time, pop_size):
+    perm = tsp.rand_perm(n)
+    perms = np.array([tsp.rand_perm(n) for i in range(pop_size)],
+                     dtype=np.int32)
+    return [
+        _result(n, 'fitness', 'total_dist',
+                _rate(lambda: tsp.total_dist(perm, city_locs), min_time),
+                'evals/s'),
+        _result(n, 'fitness', type(dists).__name__,
+                pop_size * _rate(lambda: dists.population_dists(perms),
+                                 min_time),
+                'evals/s'),
+    ]
+
+
+def bench_generations(n, dists, min_time, pop_size):
+    curr_gen = tsp.score_population(
+        [tsp.rand_perm(n) for i in range(pop_size)], dists)
+    curr_gen.sort()
+    cross = PURE_CROSSOVERS['my_crossover']
+    state = [curr_gen]
+
+    def list_generation():
+        state[0] = tsp.tournament_generation(state[0], pop_size, cross, dists)
+
+    pops = [population.Population.from_pairs(curr_gen),
+            population.Population(pop_size, n)]
+    cross_into = array_crossover('my_crossover')
+
+    def array_generation():
+        curr, nxt = pops
+        population.tournament_generation(curr, nxt, cross_into, dists)
+        pops[:] = nxt, curr
+
+    return [
+        _result(n, 'generations', 'tournament_lists',
+                _rate(list_generation, min_time), 'generations/s'),
+        _result(n, 'generations', 'tournament_arrays',
+                _rate(array_generation, min_time), 'generations/s'),
+    ]
+
+# returns the seconds a tournament selection search on arrays takes to get
+# its best tour below target_ratio times the best random starting tour, or
+# None if it doesn't within max_time seconds
+
+
+def bench_time_to_target(n, dists, pop_size, target_ratio, max_time):
+    curr = population.Population.from_perms(
+        [tsp.rand_perm(n) for i in range(pop_size)], dists)
+    nxt = population.Population(pop_size, n)
+    cross_into = array_crossover('my_crossover')
+    target = target_ratio * curr.scores.min()
+    start = time.perf_counter()
+    while curr.scores.min() > target:
+        if time.perf_counter() - start > max_time:
+            return [_result(n, 'time_to_target', f'ratio_{target_ratio}',
+                            None, 's', higher_is_better=False)]
+        population.tournament_generation(curr, nxt, cross_into, dists)
+        curr, nxt = nxt, curr
+    return [_result(n, 'time_to_target', f'ratio_{target_ratio}',
+                    time.perf_counter() - start, 's', higher_is_better=False)]
+
+
+def run(sizes, min_time, pop_size, target_ratio, max_time, seed):
+    results = []
+    for n in sizes:
+        print(f'benchmarking {n} cities ...', file=sys.stderr)
+        random.seed(seed)
+        city_locs = synthetic_city_locs(n, seed)
+        dists = make_distance(city_locs)
+        results += bench_crossovers(n, min_time)
+        results += bench_fitness(n, city_locs, dists, min_time, pop_size)
+        results += bench_generations(n, dists, min_time, pop_size)
+        results += bench_time_to_target(n, dists, pop_size, target_ratio,
+                                        max_time)
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'seed': seed,
+            'pop_size': pop_size,
+            'min_time': min_time,
+        },
+        'results': results,
+    }
+
+# returns a list of messages for results in new that are more than
+# tolerance (a fraction) worse than the same result in old
+
+
+def compare(old, new, tolerance):
+    before = {(r['size'], r['metric'], r['name']): r for r in old['results']}
+    regressions = []
+    for r in new['results']:
+        key = (r['size'], r['metric'], r['name'])
+        if key not in before:
+            continue
+        was, now = before[key]['value'], r['value']
+        if was is None:
+            continue
+        if now is None:
+            worse = True
+        elif r['higher_is_better']:
+            worse = now < was * (1 - tolerance)
+        else:
+            worse = now > was * (1 + tolerance)
+        if worse:
+            regressions.append(f'{r["metric"]} {r["name"]} at {r["size"]} '
+                               f'cities: {was} -> {now} {r["unit"]}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the TSP genetic algorithm building blocks.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='seconds to spend on each throughput measurement')
+    parser.add_argument('--pop-size', type=int, default=50)
+    parser.add_argument('--target-ratio', type=float, default=0.9)
+    parser.add_argument('--max-time', type=float, default=30.0,
+                        help='give up on time-to-target after this long')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write JSON here instead of stdout')
+    parser.add_argument('--compare', help='JSON from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.min_time, args.pop_size, args.target_ratio,
+                 args.max_time, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for message in regressions:
+            print(f'REGRESSION: {message}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
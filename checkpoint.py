@@ -0,0 +1,72 @@
+# checkpoint.py
+
+#
+# Checkpoints for long genetic algorithm runs
+#
+# A checkpoint is an uncompressed .npz file holding a population (one
+# permutation per row, int32), its scores, the state of the random module,
+# the number of generations completed and the best tour.  Files are
+# written to a temporary file next to the target and then renamed over it,
+# so a crash mid-write never leaves a truncated checkpoint behind.
+#
+
+import os
+import random
+import tempfile
+
+import numpy as np
+
+
+# The contents of a checkpoint file, as returned by load_checkpoint.
+class Checkpoint:
+    def __init__(self, tours, scores, generation, rng_state, best_tour,
+                 best_score):
+        self.tours = tours
+        self.scores = scores
+        self.generation = generation
+        self.rng_state = rng_state
+        self.best_tour = best_tour
+        self.best_score = best_score
+
+# writes a checkpoint of the population tours (a 2-D array or a list of
+# permutations) with scores after generation generations to path; rng_state
+# defaults to the current state of the random module
+
+
+def save_checkpoint(path, tours, scores, generation, rng_state=None):
+    tours = np.asarray(tours, dtype=np.int32)
+    scores = np.asarray(scores, dtype=np.float64)
+    if rng_state is None:
+        rng_state = random.getstate()
+    version, internal, gauss_next = rng_state
+    best = int(np.argmin(scores))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, tours=tours, scores=scores,
+                     generation=np.int64(generation),
+                     rng_version=np.int64(version),
+                     rng_internal=np.array(internal, dtype=np.int64),
+                     rng_gauss_next=np.float64(
+                         np.nan if gauss_next is None else gauss_next),
+                     best_tour=tours[best], best_score=scores[best])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_checkpoint(path):
+    with np.load(path) as data:
+        gauss_next = float(data['rng_gauss_next'])
+        rng_state = (int(data['rng_version']),
+                     tuple(data['rng_internal'].tolist()),
+                     None if np.isnan(gauss_next) else gauss_next)
+        return Checkpoint(data['tours'], data['scores'],
+                          int(data['generation']), rng_state,
+                          data['best_tour'].tolist(),
+                          float(data['best_score']))
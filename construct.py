@@ -0,0 +1,375 @@
+# construct.py
+
+#
+# Construction heuristics for Traveling Salesman Problem tours
+#
+# Instead of random permutations, the searches in tsp.py can start from
+# tours built by one of the heuristics in METHODS: nearest neighbour,
+# greedy edge, a Hilbert space-filling curve or randomized insertion.  All
+# of them find nearby cities with a KDTree, so a query visits about
+# O(log n) nodes instead of every city, even on clustered instances, and
+# building a tour takes about O(n log n) time.
+# Distances are planar, between the cities' coordinates.
+#
+# population() builds a whole population with one heuristic; its diversity
+# knob perturbs the coordinates each tour is built from, so the tours
+# differ while keeping most of the heuristic's quality.
+#
+
+import heapq
+import math
+import random
+
+import numpy as np
+
+from distance import coords_array
+
+# most cities in a leaf of a KDTree
+LEAF_SIZE = 8
+
+
+# A k-d tree over the cities at coords (an n x 2 array), which can be
+# queried for the cities in it nearest to a city.  Cities are 0-based
+# indexes into coords.  The tree's shape is fixed when it is built, but
+# cities can be removed from it and added back; it starts out holding every
+# city, or none if empty is true.  Each node counts the cities under it, so
+# searches skip emptied subtrees.
+class KDTree:
+    def __init__(self, coords, empty=False, leaf_size=LEAF_SIZE):
+        n = len(coords)
+        self.xs = coords[:, 0].tolist()
+        self.ys = coords[:, 1].tolist()
+        # per node: bounding box, children (None for a leaf), parent, the
+        # cities of a leaf, and how many cities under it are in the tree
+        self.box = []
+        self.children = []
+        self.parent = []
+        self.points = []
+        self.count = []
+        self.leaf = [0] * n
+        self.here = [not empty] * n
+        stack = [(np.arange(n), -1)]
+        while stack:
+            idx, parent = stack.pop()
+            node = len(self.box)
+            pts = coords[idx]
+            lo = pts.min(axis=0).tolist()
+            hi = pts.max(axis=0).tolist()
+            self.box.append((lo[0], lo[1], hi[0], hi[1]))
+            self.parent.append(parent)
+            self.count.append(0 if empty else len(idx))
+            if parent >= 0:
+                self.children[parent].append(node)
+            if len(idx) <= leaf_size:
+                self.children.append(None)
+                self.points.append(idx.tolist())
+                for i in self.points[node]:
+                    self.leaf[i] = node
+                continue
+            self.children.append([])
+            self.points.append(None)
+            # split at the median of the wider side
+            axis = int(hi[1] - lo[1] > hi[0] - lo[0])
+            half = len(idx) // 2
+            order = np.argpartition(pts[:, axis], half)
+            stack.append((idx[order[half:]], node))
+            stack.append((idx[order[:half]], node))
+
+    def __len__(self):
+        return self.count[0]
+
+    def _update(self, i, change):
+        node = self.leaf[i]
+        while node >= 0:
+            self.count[node] += change
+            node = self.parent[node]
+
+    def add(self, i):
+        if not self.here[i]:
+            self.here[i] = True
+            self._update(i, 1)
+
+    def remove(self, i):
+        if self.here[i]:
+            self.here[i] = False
+            self._update(i, -1)
+
+    # adds the cities other than city i under node to best (a heap of at
+    # most k (-squared distance, city) pairs) if they are among the k
+    # nearest to (x, y) seen so far; nodes are visited nearest box first
+    def _search(self, node, x, y, i, k, best):
+        xs, ys, here = self.xs, self.ys, self.here
+        box, children, points, count = (self.box, self.children,
+                                        self.points, self.count)
+        # the k-th nearest squared distance so far
+        worst = -best[0][0] if len(best) == k else math.inf
+        todo = [(0.0, node)]
+        while todo:
+            d2, node = heapq.heappop(todo)
+            if d2 >= worst:
+                break
+            if children[node] is None:
+                for j in points[node]:
+                    if j == i or not here[j]:
+                        continue
+                    dx = xs[j] - x
+                    dy = ys[j] - y
+                    d2 = dx*dx + dy*dy
+                    if d2 < worst:
+                        if len(best) < k:
+                            heapq.heappush(best, (-d2, j))
+                            if len(best) < k:
+                                continue
+                        else:
+                            heapq.heapreplace(best, (-d2, j))
+                        worst = -best[0][0]
+                continue
+            for child in children[node]:
+                if count[child]:
+                    x0, y0, x1, y1 = box[child]
+                    dx = x0 - x if x < x0 else (x - x1 if x > x1 else 0.0)
+                    dy = y0 - y if y < y0 else (y - y1 if y > y1 else 0.0)
+                    d2 = dx*dx + dy*dy
+                    if d2 < worst:
+                        heapq.heappush(todo, (d2, child))
+
+    # returns up to k cities in the tree nearest to city i (which needn't
+    # be in the tree), nearest first.  The search starts in i's leaf and
+    # works up the tree, until no city outside the current subtree can be
+    # nearer than the k-th nearest found.
+    def nearest(self, i, k=1):
+        x, y = self.xs[i], self.ys[i]
+        best = []
+        node = self.leaf[i]
+        self._search(node, x, y, i, k, best)
+        while True:
+            if len(best) == k:
+                x0, y0, x1, y1 = self.box[node]
+                inside = min(x - x0, x1 - x, y - y0, y1 - y)
+                if inside > 0 and -best[0][0] <= inside * inside:
+                    break
+            parent = self.parent[node]
+            if parent < 0:
+                break
+            for child in self.children[parent]:
+                if child != node and self.count[child]:
+                    self._search(child, x, y, i, k, best)
+            node = parent
+        return [j for d2, j in sorted(best, reverse=True)]
+
+
+# returns the typical distance between neighbouring cities at coords (an
+# n x 2 array): the mean distance from a city to its nearest neighbour,
+# over a sample of up to samples cities
+
+
+def spacing(coords, tree=None, samples=1000):
+    n = len(coords)
+    if n < 2:
+        return 0.0
+    if tree is None:
+        tree = KDTree(coords)
+    total = 0.0
+    sample = range(0, n, max(1, n // samples))
+    for i in sample:
+        j = tree.nearest(i)[0]
+        total += math.hypot(*(coords[i] - coords[j]))
+    return total / len(sample)
+
+# returns the tour (a list of city names) that starts at city index start
+# (a random city if None) and always goes on to the nearest city not yet
+# visited
+
+
+def nearest_neighbor(coords, start=None):
+    n = len(coords)
+    if start is None:
+        start = random.randrange(n)
+    tree = KDTree(coords)
+    tree.remove(start)
+    tour = [start]
+    curr = start
+    while len(tree):
+        curr = tree.nearest(curr)[0]
+        tree.remove(curr)
+        tour.append(curr)
+    return [c + 1 for c in tour]
+
+# returns the tour built by the greedy edge heuristic: edges are taken
+# shortest first, skipping any that would give a city three edges or close
+# a cycle early.  Only edges to each city's k nearest neighbours are
+# considered; the paths they leave are then joined nearest end first.
+
+
+def greedy_edge(coords, k=8):
+    n = len(coords)
+    if n < 3:
+        return list(range(1, n + 1))
+    tree = KDTree(coords)
+    ii, jj = [], []
+    for i in range(n):
+        for j in tree.nearest(i, k):
+            ii.append(i)
+            jj.append(j)
+    ii = np.array(ii)
+    jj = np.array(jj)
+    lengths = np.hypot(coords[ii, 0] - coords[jj, 0],
+                       coords[ii, 1] - coords[jj, 1])
+    order = np.argsort(lengths, kind='stable')
+
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    adj = [[] for i in range(n)]
+    edges = 0
+    for i, j in zip(ii[order].tolist(), jj[order].tolist()):
+        if len(adj[i]) == 2 or len(adj[j]) == 2:
+            continue
+        ri, rj = find(i), find(j)
+        if ri == rj:
+            continue
+        parent[ri] = rj
+        adj[i].append(j)
+        adj[j].append(i)
+        edges += 1
+        if edges == n - 1:
+            break
+
+    # join the paths: walk one to its other end, then jump to the nearest
+    # end of another
+    ends = KDTree(coords, empty=True)
+    for i in range(n):
+        if len(adj[i]) < 2:
+            ends.add(i)
+    tour = []
+    a = next(i for i in range(n) if len(adj[i]) < 2)
+    while True:
+        ends.remove(a)
+        prev, curr = -1, a
+        while True:
+            tour.append(curr)
+            nxt = [c for c in adj[curr] if c != prev]
+            if not nxt:
+                break
+            prev, curr = curr, nxt[0]
+        if curr != a:
+            ends.remove(curr)
+        if not len(ends):
+            break
+        a = ends.nearest(curr)[0]
+    return [c + 1 for c in tour]
+
+# returns the index along a Hilbert curve of order order of every point
+# (x, y), where x and y are arrays of ints from 0 to 2**order - 1
+
+
+def hilbert_index(x, y, order=16):
+    x = np.array(x, dtype=np.int64)
+    y = np.array(y, dtype=np.int64)
+    side = 1 << order
+    d = np.zeros(len(x), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant so the curve inside it has the right shape
+        flip = ~ry & rx
+        x = np.where(flip, side - 1 - x, x)
+        y = np.where(flip, side - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    return d
+
+# returns the tour visiting the cities in the order of a Hilbert curve
+# through their bounding square
+
+
+def hilbert(coords, order=16):
+    lo = coords.min(axis=0)
+    side = (coords.max(axis=0) - lo).max() or 1.0
+    q = ((coords - lo) / side * ((1 << order) - 1)).astype(np.int64)
+    d = hilbert_index(q[:, 0], q[:, 1], order)
+    return (np.argsort(d, kind='stable') + 1).tolist()
+
+# returns the tour built by inserting the cities in random order, each into
+# the cheapest of the tour edges next to its k nearest cities in the tour so
+# far
+
+
+def random_insertion(coords, k=3):
+    n = len(coords)
+    order = list(range(n))
+    random.shuffle(order)
+    if n <= 3:
+        return [c + 1 for c in order]
+    tree = KDTree(coords, empty=True)
+    xs, ys = tree.xs, tree.ys
+
+    def d(i, j):
+        return math.hypot(xs[i] - xs[j], ys[i] - ys[j])
+
+    succ = [0] * n
+    pred = [0] * n
+    for i in range(3):
+        a, b = order[i], order[(i + 1) % 3]
+        succ[a] = b
+        pred[b] = a
+        tree.add(a)
+    for c in order[3:]:
+        best = None
+        for p in tree.nearest(c, k):
+            for u, v in ((pred[p], p), (p, succ[p])):
+                cost = d(u, c) + d(c, v) - d(u, v)
+                if best is None or cost < best[0]:
+                    best = (cost, u, v)
+        cost, u, v = best
+        succ[u] = c
+        pred[c] = u
+        succ[c] = v
+        pred[v] = c
+        tree.add(c)
+
+    tour = [order[0]]
+    c = succ[order[0]]
+    while c != order[0]:
+        tour.append(c)
+        c = succ[c]
+    return [c + 1 for c in tour]
+
+
+# heuristics selectable by name; each takes an n x 2 coordinate array and
+# returns a tour as a list of city names
+METHODS = {
+    'nearest_neighbor': nearest_neighbor,
+    'greedy': greedy_edge,
+    'hilbert': hilbert,
+    'random_insertion': random_insertion,
+}
+
+# returns pop_size tours of the cities in city_locs built with the
+# heuristic named method.  The first is built from the cities' own
+# coordinates; the others from coordinates moved by normal noise whose
+# standard deviation is diversity times the cities' spacing (see spacing),
+# so diversity=0 repeats the heuristic as is (nearest neighbour and
+# random insertion still vary from tour to tour) and larger values give
+# more varied, longer tours.  Reproducible with random.seed.
+
+
+def population(city_locs, pop_size, method='greedy', diversity=0.5):
+    coords = coords_array(city_locs)
+    build = METHODS[method]
+    rng = np.random.default_rng(random.getrandbits(64))
+    sigma = diversity * spacing(coords) if diversity else 0.0
+    tours = [build(coords)]
+    for i in range(1, pop_size):
+        if sigma:
+            tours.append(build(coords + rng.normal(0.0, sigma, coords.shape)))
+        else:
+            tours.append(build(coords))
+    return tours
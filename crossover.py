@@ -0,0 +1,343 @@
+# crossover.py
+
+#
+# Linear-time crossover operators for the Traveling Salesman Problem
+#
+# Every operator takes two parent permutations s and t of the cities 1 to n
+# and returns two offspring, leaving the parents untouched.  The operators in
+# PURE_CROSSOVERS only recombine; the ones in CROSSOVERS also mutate each
+# child with rand_swap, as the crossovers in tsp.py do.  Instead of
+# scanning lists with `in`, they keep a membership bitmap (a bytearray
+# indexed by city name) or a position index, so each child costs O(n).
+#
+# The *_into variants take parents that are rows of a NumPy array and write
+# their children into two preallocated rows, without building Python lists;
+# like PURE_CROSSOVERS, they don't mutate.
+#
+
+import random
+
+import numpy as np
+
+from moves import rand_swap
+
+# returns a bytearray of length n+1 with a 1 at index c for every city c in
+# cities
+
+
+def _bitmap(cities, n):
+    result = bytearray(n + 1)
+    for c in cities:
+        result[c] = 1
+    return result
+
+# returns a list pos such that pos[perm[i]] == i
+
+
+def _positions(perm):
+    pos = [0] * (len(perm) + 1)
+    for i, c in enumerate(perm):
+        pos[c] = i
+    return pos
+
+# returns two random cut points 0 <= i < j <= n
+
+
+def _cut_points(n):
+    i = random.randrange(n)
+    j = random.randrange(i + 1, n + 1)
+    return i, j
+
+
+# Same offspring as tsp.my_crossover before its random swaps, for the same
+# random choices: the first child is a copy of s, and in the second the
+# cities of t[c:c+r] keep their positions in s but are put in the order they
+# appear in t.
+def _my_crossover(s, t):
+    n = len(s)
+    c = random.randrange(1, n-1)
+    r = random.randrange(1, n-c)
+
+    first_offspring = s[:]
+
+    sub_lst = t[c:c+r]
+    in_sub = _bitmap(sub_lst, n)
+    second_offspring = s[:]
+    i = 0
+    for j in range(n):
+        if in_sub[second_offspring[j]]:
+            second_offspring[j] = sub_lst[i]
+            i += 1
+
+    return first_offspring, second_offspring
+
+# fixes up the middle segment mid of one parent so that it holds exactly the
+# cities of keep, drawing replacements from the other parent's outer
+# segments left and right; this is what the nested loops of tsp.tpxwr do
+
+
+def _tpxwr_fill(mid, keep, left, right, n):
+    in_keep = _bitmap(keep, n)
+    in_mid = _bitmap(mid, n)
+    # tsp.tpxwr gives each bad city the *last* usable city of left (or right,
+    # if left has none), and a city once used is never usable again, so the
+    # candidates can be popped off the end of a list
+    from_left = [x for x in left if in_keep[x] and not in_mid[x]]
+    from_right = [x for x in right if in_keep[x] and not in_mid[x]]
+    for i in range(len(mid)):
+        if not in_keep[mid[i]]:
+            mid[i] = from_left.pop() if from_left else from_right.pop()
+
+
+# Same offspring as tsp.tpxwr (Ammar Al-Dallal's two-point crossover with
+# repair) before its random swaps, for the same random choices, in O(n).
+def _tpxwr(s, t):
+    n = len(s)
+
+    cp1 = random.randrange(1, n-2)
+    cp2 = random.randrange(cp1+1, n-1)
+
+    a = s[:cp1]
+    b = s[cp1:cp2]
+    c = s[cp2:n]
+
+    d = t[:cp1]
+    e = t[cp1:cp2]
+    f = t[cp2:n]
+
+    _tpxwr_fill(e, b, d, f, n)
+    _tpxwr_fill(b, t[cp1:cp2], a, c, n)
+
+    first_offspring = a + e + c
+    second_offspring = d + b + f
+
+    return first_offspring, second_offspring
+
+# returns the child of order crossover (OX) that keeps p[i:j] in place and
+# fills the rest with the other cities in the order they appear in q,
+# starting after the segment and wrapping around
+
+
+def _ox_child(p, q, i, j):
+    n = len(p)
+    child = p[:]
+    in_seg = _bitmap(p[i:j], n)
+    k = j % n
+    for x in q[j:] + q[:j]:
+        if not in_seg[x]:
+            child[k] = x
+            k = (k + 1) % n
+    return child
+
+
+def order_crossover(s, t):
+    i, j = _cut_points(len(s))
+    return _ox_child(s, t, i, j), _ox_child(t, s, i, j)
+
+# returns the child of partially mapped crossover (PMX) that takes p[i:j]
+# and everything else from q, following the mapping between the two
+# segments to resolve conflicts
+
+
+def _pmx_child(p, q, i, j):
+    n = len(p)
+    child = q[:]
+    child[i:j] = p[i:j]
+    in_seg = _bitmap(p[i:j], n)
+    pos_p = _positions(p)
+    for k in list(range(i)) + list(range(j, n)):
+        x = q[k]
+        while in_seg[x]:
+            x = q[pos_p[x]]
+        child[k] = x
+    return child
+
+
+def pmx(s, t):
+    i, j = _cut_points(len(s))
+    return _pmx_child(s, t, i, j), _pmx_child(t, s, i, j)
+
+
+# Cycle crossover (CX): the positions are split into the cycles of the
+# mapping s[k] -> t[k], and the children alternate taking whole cycles from
+# s and t, so every city keeps the position it had in one of the parents.
+def cycle_crossover(s, t):
+    n = len(s)
+    pos_s = _positions(s)
+    first_offspring = s[:]
+    second_offspring = t[:]
+    seen = bytearray(n)
+    cycle = 0
+    for start in range(n):
+        if seen[start]:
+            continue
+        k = start
+        while not seen[k]:
+            seen[k] = 1
+            if cycle % 2 == 1:
+                first_offspring[k] = t[k]
+                second_offspring[k] = s[k]
+            k = pos_s[t[k]]
+        cycle += 1
+    return first_offspring, second_offspring
+
+# returns one child of edge recombination (ERX), starting from city start
+
+
+def _erx_child(s, t, start):
+    n = len(s)
+    neighbors = [set() for _ in range(n + 1)]
+    for p in (s, t):
+        for k in range(n):
+            neighbors[p[k]].add(p[k-1])
+            neighbors[p[k]].add(p[(k+1) % n])
+
+    # unvisited cities, with their positions so that removal is O(1)
+    unvisited = list(range(1, n + 1))
+    where = list(range(-1, n))
+
+    child = []
+    c = start
+    while True:
+        child.append(c)
+        k = where[c]
+        unvisited[k] = unvisited[-1]
+        where[unvisited[k]] = k
+        unvisited.pop()
+        if not unvisited:
+            return child
+        for x in neighbors[c]:
+            neighbors[x].discard(c)
+        if neighbors[c]:
+            fewest = min(len(neighbors[x]) for x in neighbors[c])
+            c = random.choice([x for x in neighbors[c]
+                               if len(neighbors[x]) == fewest])
+        else:
+            c = random.choice(unvisited)
+
+
+def edge_recombination(s, t):
+    return _erx_child(s, t, s[0]), _erx_child(s, t, t[0])
+
+# returns a crossover that calls op and then applies one random swap to each
+# child, like tsp.my_crossover and tsp.tpxwr do
+
+
+def with_rand_swap(op):
+    def crossover(s, t):
+        first_offspring, second_offspring = op(s, t)
+        rand_swap(first_offspring)
+        rand_swap(second_offspring)
+        return first_offspring, second_offspring
+    return crossover
+
+
+# O(n) equivalents of tsp.my_crossover and tsp.tpxwr, random swaps included
+my_crossover = with_rand_swap(_my_crossover)
+tpxwr = with_rand_swap(_tpxwr)
+
+# swaps two random cities of row, like rand_swap does for a list
+
+
+def rand_swap_row(row):
+    n = len(row)
+    i, j = random.randrange(n), random.randrange(n)
+    row[i], row[j] = row[j], row[i]
+
+# returns a boolean array of length n+1 that is true at the cities in cities
+
+
+def _mask(cities, n):
+    result = np.zeros(n + 1, dtype=bool)
+    result[cities] = True
+    return result
+
+
+def my_crossover_into(s, t, out1, out2):
+    n = len(s)
+    c = random.randrange(1, n-1)
+    r = random.randrange(1, n-c)
+
+    out1[:] = s
+    out2[:] = s
+    out2[_mask(t[c:c+r], n)[s]] = t[c:c+r]
+
+# array version of _tpxwr_fill, returning the repaired copy of mid
+
+
+def _tpxwr_fill_array(mid, keep, left, right, n):
+    in_keep = _mask(keep, n)
+    in_mid = _mask(mid, n)
+    from_left = left[in_keep[left] & ~in_mid[left]]
+    from_right = right[in_keep[right] & ~in_mid[right]]
+    result = mid.copy()
+    result[~in_keep[mid]] = np.concatenate((from_left[::-1], from_right[::-1]))
+    return result
+
+
+def tpxwr_into(s, t, out1, out2):
+    n = len(s)
+
+    cp1 = random.randrange(1, n-2)
+    cp2 = random.randrange(cp1+1, n-1)
+
+    out1[:] = s
+    out1[cp1:cp2] = _tpxwr_fill_array(t[cp1:cp2], s[cp1:cp2],
+                                      t[:cp1], t[cp2:], n)
+    out2[:] = t
+    out2[cp1:cp2] = _tpxwr_fill_array(s[cp1:cp2], t[cp1:cp2],
+                                      s[:cp1], s[cp2:], n)
+
+# array version of _ox_child, writing the child into out
+
+
+def _ox_into(p, q, i, j, out):
+    n = len(p)
+    in_seg = _mask(p[i:j], n)
+    rest = np.concatenate((q[j:], q[:j]))
+    rest = rest[~in_seg[rest]]
+    out[i:j] = p[i:j]
+    out[j:] = rest[:n-j]
+    out[:i] = rest[n-j:]
+
+
+def order_crossover_into(s, t, out1, out2):
+    i, j = _cut_points(len(s))
+    _ox_into(s, t, i, j, out1)
+    _ox_into(t, s, i, j, out2)
+
+
+# crossovers selectable by name from the search functions
+PURE_CROSSOVERS = {
+    'my_crossover': _my_crossover,
+    'tpxwr': _tpxwr,
+    'ox': order_crossover,
+    'pmx': pmx,
+    'cx': cycle_crossover,
+    'erx': edge_recombination,
+}
+
+# the same crossovers, mutating their children with rand_swap
+CROSSOVERS = {name: with_rand_swap(op) for name, op in PURE_CROSSOVERS.items()}
+
+# the *_into crossovers, under the same names as in PURE_CROSSOVERS
+ARRAY_CROSSOVERS = {
+    'my_crossover': my_crossover_into,
+    'tpxwr': tpxwr_into,
+    'ox': order_crossover_into,
+}
+
+# returns the *_into version of the crossover called name; crossovers with no
+# array version go through lists
+
+
+def array_crossover(name):
+    if name in ARRAY_CROSSOVERS:
+        return ARRAY_CROSSOVERS[name]
+    op = PURE_CROSSOVERS[name]
+
+    def crossover_into(s, t, out1, out2):
+        first_offspring, second_offspring = op(s.tolist(), t.tolist())
+        out1[:] = first_offspring
+        out2[:] = second_offspring
+    return crossover_into
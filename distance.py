@@ -0,0 +1,167 @@
+# distance.py
+
+#
+# Distance backends for the Traveling Salesman Problem
+#
+# City names run from 1 to n, as in tsp.py.  A backend is built once per
+# instance and can then score single tours or a whole population at once.
+#
+
+import numpy as np
+
+# instances with more cities than this don't get a dense n x n matrix (which
+# would need 8*n*n bytes, 128 MB at the limit, in every process of an
+# island search); their distances are computed from the coordinates on the
+# fly instead
+MAX_MATRIX_CITIES = 4000
+
+# most entries of the temporary arrays used to build a DistanceMatrix
+MATRIX_BLOCK = 1 << 20
+
+# returns city_locs (a list of coordinate pairs, e.g. from load_city_locs) as
+# an n x 2 float64 array
+
+
+def coords_array(city_locs):
+    return np.asarray(city_locs, dtype=np.float64).reshape(-1, 2)
+
+# returns perms (a list of permutations, or a 2-D array with one permutation
+# per row) as a 2-D array of zero-based city indexes
+
+
+def perm_indexes(perms):
+    idx = np.asarray(perms, dtype=np.intp)
+    if idx.ndim == 1:
+        idx = idx.reshape(1, -1)
+    return idx - 1
+
+# sums the rows of edge_lens from left to right, so the result is exactly the
+# same float total_dist gets by adding one edge at a time
+
+
+def _row_sums(edge_lens):
+    return np.cumsum(edge_lens, axis=1)[:, -1]
+
+
+# Precomputes the distance between every pair of cities.
+class DistanceMatrix:
+    euclidean = True
+
+    def __init__(self, city_locs):
+        self.coords = coords_array(city_locs)
+        self.n = len(self.coords)
+        xs = self.coords[:, 0]
+        ys = self.coords[:, 1]
+        # filled a block of rows at a time, in place, so building it takes
+        # little more memory than the matrix itself
+        self.matrix = np.empty((self.n, self.n))
+        block = max(1, MATRIX_BLOCK // max(1, self.n))
+        for start in range(0, self.n, block):
+            rows = self.matrix[start:start+block]
+            dy = np.subtract.outer(ys[start:start+block], ys)
+            np.subtract.outer(xs[start:start+block], xs, out=rows)
+            np.multiply(rows, rows, out=rows)
+            np.multiply(dy, dy, out=dy)
+            np.add(rows, dy, out=rows)
+            np.sqrt(rows, out=rows)
+
+    # c1 and c2 are integer names of cities, ranging from 1 to n
+    def city_dist(self, c1, c2):
+        return float(self.matrix[c1-1, c2-1])
+
+    # returns the length of every edge of every tour, in total_dist's order:
+    # the closing edge first, then the edges between consecutive cities
+    def edge_lengths(self, idx):
+        return self.matrix[np.roll(idx, 1, axis=1), idx]
+
+    def total_dist(self, city_perm):
+        return float(self.population_dists([city_perm])[0])
+
+    # returns a float64 array with the tour length of every permutation in
+    # perms, scored as a single batch
+    def population_dists(self, perms):
+        return _row_sums(self.edge_lengths(perm_indexes(perms)))
+
+
+# Same interface as DistanceMatrix, but only keeps the coordinates, so it
+# works for instances too large for a dense matrix.
+class CoordDistance:
+    euclidean = True
+
+    def __init__(self, city_locs):
+        self.coords = coords_array(city_locs)
+        self.n = len(self.coords)
+
+    def city_dist(self, c1, c2):
+        dx, dy = self.coords[c1-1] - self.coords[c2-1]
+        return float(np.sqrt(dx*dx + dy*dy))
+
+    def edge_lengths(self, idx):
+        a = self.coords[np.roll(idx, 1, axis=1)]
+        b = self.coords[idx]
+        dx = a[..., 0] - b[..., 0]
+        dy = a[..., 1] - b[..., 1]
+        return np.sqrt(dx*dx + dy*dy)
+
+    def total_dist(self, city_perm):
+        return float(self.population_dists([city_perm])[0])
+
+    def population_dists(self, perms):
+        return _row_sums(self.edge_lengths(perm_indexes(perms)))
+
+# converts TSPLIB GEO coordinates (DDD.MM degrees and minutes) to radians,
+# the way TSPLIB does
+
+
+def _geo_radians(x):
+    deg = np.trunc(x)
+    return 3.141592 * (deg + 5.0 * (x - deg) / 3.0) / 180.0
+
+
+# Distances for TSPLIB GEO instances, whose coordinates are latitudes and
+# longitudes: the great circle distance in km on TSPLIB's idealized sphere,
+# truncated to an integer as TSPLIB specifies.  Computed on the fly.
+class GeoDistance:
+    euclidean = False
+
+    def __init__(self, city_locs):
+        self.coords = coords_array(city_locs)
+        self.n = len(self.coords)
+        self.lat = _geo_radians(self.coords[:, 0])
+        self.lon = _geo_radians(self.coords[:, 1])
+
+    def _dist(self, i, j):
+        q1 = np.cos(self.lon[i] - self.lon[j])
+        q2 = np.cos(self.lat[i] - self.lat[j])
+        q3 = np.cos(self.lat[i] + self.lat[j])
+        return np.trunc(6378.388 * np.arccos(
+            0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3)) + 1.0)
+
+    def city_dist(self, c1, c2):
+        if c1 == c2:
+            return 0.0
+        return float(self._dist(c1-1, c2-1))
+
+    def edge_lengths(self, idx):
+        prev = np.roll(idx, 1, axis=1)
+        return np.where(prev == idx, 0.0, self._dist(prev, idx))
+
+    def total_dist(self, city_perm):
+        return float(self.population_dists([city_perm])[0])
+
+    def population_dists(self, perms):
+        return _row_sums(self.edge_lengths(perm_indexes(perms)))
+
+# returns the backend to use for city_locs under metric (a TSPLIB edge
+# weight type, see loaders.instance_metric): for EUC_2D a DistanceMatrix
+# when the matrix fits within max_matrix_cities and a CoordDistance
+# otherwise, and for GEO a GeoDistance
+
+
+def make_distance(city_locs, metric='EUC_2D',
+                  max_matrix_cities=MAX_MATRIX_CITIES):
+    if metric == 'GEO':
+        return GeoDistance(city_locs)
+    if len(city_locs) <= max_matrix_cities:
+        return DistanceMatrix(city_locs)
+    return CoordDistance(city_locs)
@@ -0,0 +1,389 @@
+# engine.py
+
+#
+# A configurable genetic algorithm engine for the Traveling Salesman Problem
+#
+# An Engine runs generations of a GA whose selection, crossover, mutation
+# and elitism are all chosen by name, on either a list of (score,
+# permutation) pairs or a population.Population.  A run stops at the first
+# budget it exhausts: a number of generations, a wall-clock time limit, a
+# number of tour evaluations, a target tour length, or a number of
+# generations without improvement of the best tour.  It returns a Result
+# with the best tour and statistics about the run, so callers can ask for
+# e.g. "the best tour found within 2 seconds" instead of guessing iteration
+# counts.  The searches in tsp.py are thin wrappers around it.
+#
+
+import random
+import time
+
+import numpy as np
+
+import population
+import telemetry
+from checkpoint import save_checkpoint
+from crossover import PURE_CROSSOVERS, array_crossover, rand_swap_row
+from fitness_cache import FitnessCache
+from local_search import LocalSearch
+from moves import MOVES, rand_move, rand_swap
+from validation import check, check_rows, validation_level
+
+# selection strategies, see population.binary_tournament, and the fraction
+# of the population (best first) that parents are picked from by default
+SELECTIONS = {
+    'tournament': (population.binary_tournament, 2/3),
+    'truncation': (population.uniform, 1/2),
+}
+
+# returns a mutation applying the move named kind (from moves.MOVES) at two
+# random positions of a list
+
+
+def rand_move_mutation(kind):
+    move = MOVES[kind]
+
+    def mutate(tour):
+        n = len(tour)
+        i, j = random.randrange(n), random.randrange(n)
+        move(tour, i, j)
+    return mutate
+
+# returns a function that applies the move named kind at two random
+# positions of a list tour, whose length is score, and returns the new
+# length, found in constant time from the changed edges with dists (see
+# moves.rand_move)
+
+
+def delta_mutation(kind, dists):
+    def move(tour, score):
+        return rand_move(tour, score, dists, kind)
+    return move
+
+# the array versions of the moves, on a row of a population.Population
+
+
+def rand_two_opt_row(row):
+    n = len(row)
+    i, j = random.randrange(n), random.randrange(n)
+    if i > j:
+        i, j = j, i
+    row[i:j+1] = row[i:j+1][::-1].copy()
+
+
+def rand_insertion_row(row):
+    n = len(row)
+    i, j = random.randrange(n), random.randrange(n)
+    if i < j:
+        row[i:j+1] = np.roll(row[i:j+1], -1)
+    elif j < i:
+        row[j:i+1] = np.roll(row[j:i+1], 1)
+
+
+def no_mutation(tour):
+    pass
+
+
+# mutations applied to every child, as (list version, array version) pairs
+MUTATIONS = {
+    'swap': (rand_swap, rand_swap_row),
+    '2opt': (rand_move_mutation('2opt'), rand_two_opt_row),
+    'insertion': (rand_move_mutation('insertion'), rand_insertion_row),
+    'none': (no_mutation, no_mutation),
+}
+
+# returns the generation after curr_gen (a sorted list of (score,
+# permutation) pairs), also sorted: the elites best permutations are copied
+# over unchanged and the rest are offspring of parents picked by select (see
+# SELECTIONS) from the pool_size best; cross is a crossover from
+# crossover.PURE_CROSSOVERS, whose children are then mutated with mutate,
+# dists is a backend from distance.make_distance and timer an optional
+# telemetry.PhaseTimer.  The last mutants members are instead copies of
+# single parents changed by move (see delta_mutation), which are scored
+# from their parent's score rather than by dists.
+
+
+def generation(curr_gen, pop_size, select, pool_size, elites, cross, dists,
+               mutate=MUTATIONS['swap'][0], timer=None, mutants=0, move=None):
+    pool = list(range(min(pool_size, len(curr_gen))))
+    scores = [score for score, p in curr_gen]
+    children = pop_size - mutants
+    next_gen = [p for score, p in curr_gen[:elites]]
+    while len(next_gen) < children:
+        s = curr_gen[select(pool, scores)][1]
+        t = curr_gen[select(pool, scores)][1]
+        if timer:
+            timer.lap('selection')
+        first, second = cross(s, t)
+        if timer:
+            timer.lap('crossover')
+        mutate(first)
+        mutate(second)
+        if timer:
+            timer.lap('mutation')
+        next_gen.append(first)
+        next_gen.append(second)
+
+    next_gen = next_gen[:children]
+    result = list(zip(dists.population_dists(next_gen).tolist(), next_gen))
+    if timer:
+        timer.lap('evaluation')
+    for i in range(mutants):
+        score, p = curr_gen[select(pool, scores)]
+        q = p[:]
+        result.append((move(q, score), q))
+    if mutants and timer:
+        timer.lap('mutation')
+    result.sort()
+    if timer:
+        timer.lap('sort')
+    return result
+
+# returns a telemetry.Profiler that has been enabled if profile is true (or
+# the name of a file to dump the profile to), and None otherwise
+
+
+def start_profiler(profile):
+    if not profile:
+        return None
+    profiler = telemetry.Profiler(profile if isinstance(profile, str) else None)
+    profiler.enable()
+    return profiler
+
+
+# What Engine.run returns: the best tour and its length, the final
+# population as a sorted list of (score, permutation) pairs, the number of
+# generations completed (counting any before a resumed checkpoint), the
+# number of tours scored, the seconds taken and spent in local search, the
+# best score after every generation of this run, why the run stopped
+# ('max_iter', 'time_limit', 'max_evals', 'target' or 'stagnation') and
+# the fitness cache's statistics (see FitnessCache.stats), if it had one.
+class Result:
+    def __init__(self, curr_gen, generations, evaluations, elapsed, ls_time,
+                 history, stop_reason, cache_stats=None):
+        self.best_score, self.best_tour = curr_gen[0]
+        self.population = curr_gen
+        self.generations = generations
+        self.evaluations = evaluations
+        self.elapsed = elapsed
+        self.ls_time = ls_time
+        self.history = history
+        self.stop_reason = stop_reason
+        self.cache_stats = cache_stats
+
+
+# Runs a genetic algorithm on the instance whose distances are dists (a
+# backend from distance.make_distance).
+#
+# crossover names an operator in crossover.PURE_CROSSOVERS, selection one in
+# SELECTIONS and mutation one in MUTATIONS.  Parents are picked from the
+# best pool (a fraction) of the population, which defaults to the
+# selection's own, and the elites best permutations survive unchanged into
+# the next generation.  A nonzero ls_budget spends up to that many seconds
+# per generation improving the population with 2-opt and Or-opt moves.
+# With arrays=True the population is kept in a population.Population.
+# A nonzero cache_size scores tours through a fitness_cache.FitnessCache of
+# that many tours, kept across generations and runs, so only tours never
+# seen before count as evaluations.  A nonzero mutants replaces that many
+# children per generation with copies of single parents changed by the
+# mutation's move, scored in constant time from the parent's score (see
+# moves.rand_move); they aren't counted as evaluations, and can drift from
+# the exact tour length by a few ulps per move.  validation is the level (see
+# validation.py) at which the run checks its tours are permutations: the
+# starting population and the best tour always, unless it is 'off', and
+# the population after each generation at the 'sampled' or 'full' rate.
+#
+# The budgets are max_iter generations, time_limit seconds, max_evals tour
+# evaluations, reaching a tour of length target or better, and patience
+# generations in a row that don't improve the best tour by more than
+# min_gain; any of them may be None, but not all.  observers, profile,
+# checkpoint and checkpoint_every work as in tsp.py's searches, and a
+# progress line is printed every print_every generations.
+class Engine:
+    def __init__(self, dists, pop_size, crossover='my_crossover',
+                 selection='tournament', pool=None, elites=1, mutation='swap',
+                 arrays=False, ls_budget=0, max_iter=None, time_limit=None,
+                 max_evals=None, target=None, patience=None, min_gain=0.0,
+                 observers=(), profile=False, checkpoint=None,
+                 checkpoint_every=10, print_every=None, cache_size=0,
+                 validation='sampled', mutants=0):
+        assert (max_iter is not None or time_limit is not None or
+                max_evals is not None or target is not None or
+                patience is not None), 'the run needs a budget'
+        self.dists = dists
+        self.pop_size = pop_size
+        self.crossover = crossover
+        self.select, default_pool = SELECTIONS[selection]
+        # sized by the population, whatever the number of cities
+        self.pool_size = max(1, int(pop_size * (pool or default_pool)))
+        self.elites = min(elites, pop_size)
+        self.mutate, self.mutate_row = MUTATIONS[mutation]
+        assert 0 <= mutants <= pop_size - self.elites, \
+            'mutants must fit beside the elites'
+        assert not mutants or mutation in MOVES, \
+            f'mutants need a move from moves.MOVES, not {mutation!r}'
+        self.mutants = mutants
+        # changes are scored by the plain backend, which has city_dist
+        self.move = delta_mutation(mutation, dists) if mutants else None
+        self.arrays = arrays
+        self.ls_budget = ls_budget
+        self.ls = LocalSearch(dists) if ls_budget else None
+        self.cache = FitnessCache(dists, cache_size) if cache_size else None
+        # what tours are scored with
+        self.scorer = dists if self.cache is None else self.cache
+        self._misses = 0
+        self.max_iter = max_iter
+        self.time_limit = time_limit
+        self.max_evals = max_evals
+        self.target = target
+        self.patience = patience
+        self.min_gain = min_gain
+        self.observers = observers
+        self.profile = profile
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.print_every = print_every
+        self.validation = validation
+
+    # returns the number of tours that were really scored out of the count
+    # just passed to the scorer
+    def _scored(self, count):
+        if self.cache is None:
+            return count
+        result = self.cache.misses - self._misses
+        self._misses = self.cache.misses
+        return result
+
+    # returns the reason to stop before running generation i, or None
+    def _stop_reason(self, i, evaluations, elapsed, best, stalled):
+        if self.max_iter is not None and i >= self.max_iter:
+            return 'max_iter'
+        if self.time_limit is not None and elapsed >= self.time_limit:
+            return 'time_limit'
+        if (self.max_evals is not None and
+                evaluations + self.pop_size > self.max_evals):
+            return 'max_evals'
+        if self.target is not None and best <= self.target:
+            return 'target'
+        if self.patience is not None and stalled >= self.patience:
+            return 'stagnation'
+        return None
+
+    # runs the GA from perms (a list of permutations) and returns a Result.
+    # Without scores, perms are scored and only the best pop_size of them
+    # kept.  With scores (e.g. from a checkpoint), perms are taken as they
+    # are and the run continues after first_iter generations.
+    def run(self, perms, scores=None, first_iter=0):
+        with validation_level(self.validation):
+            check_rows(perms, sample=False)
+            result = self._run(perms, scores, first_iter)
+            check(result.best_tour, sample=False)
+        return result
+
+    def _run(self, perms, scores, first_iter):
+        dists = self.scorer
+        pop_size = self.pop_size
+        evaluations = 0
+        if self.cache is not None:
+            self._misses = self.cache.misses
+        if scores is None:
+            curr_gen = list(zip(dists.population_dists(perms).tolist(), perms))
+            evaluations += self._scored(len(perms))
+            curr_gen.sort()
+            curr_gen = curr_gen[:pop_size]
+            rows = curr_gen
+        else:
+            rows = list(zip(scores, perms))
+            curr_gen = sorted(rows)
+        assert len(curr_gen) == pop_size
+
+        if self.arrays:
+            # keep the given row order, so a resumed run continues exactly
+            curr = population.Population.from_pairs(rows)
+            nxt = population.Population(pop_size, dists.n)
+            cross = array_crossover(self.crossover)
+        else:
+            cross = PURE_CROSSOVERS[self.crossover]
+        timer = telemetry.PhaseTimer() if self.observers else None
+        history = []
+        best = curr_gen[0][0]
+        stalled = 0
+        i = first_iter
+        profiler = start_profiler(self.profile)
+        start = time.perf_counter()
+        while True:
+            elapsed = time.perf_counter() - start
+            stop_reason = self._stop_reason(i, evaluations, elapsed, best,
+                                            stalled)
+            if stop_reason:
+                break
+            if self.print_every and i % self.print_every == 0:
+                print(f'Iter {i} being simulated...')
+            if timer:
+                timer.start()
+            if self.arrays:
+                population.generation(curr, nxt, self.select, self.pool_size,
+                                      self.elites, cross, dists,
+                                      self.mutate_row, timer, self.mutants,
+                                      self.move)
+                curr, nxt = nxt, curr
+            else:
+                curr_gen = generation(curr_gen, pop_size, self.select,
+                                      self.pool_size, self.elites, cross,
+                                      dists, self.mutate, timer, self.mutants,
+                                      self.move)
+            evaluations += self._scored(pop_size - self.mutants)
+            check_rows(curr.tours if self.arrays else
+                       [p for score, p in curr_gen])
+            if self.ls:
+                budget = self.ls_budget
+                if self.time_limit is not None:
+                    budget = max(0.0, min(budget, self.time_limit -
+                                          (time.perf_counter() - start)))
+                if self.arrays:
+                    self.ls.improve_rows(curr, budget)
+                else:
+                    curr_gen = self.ls.improve_population(curr_gen, budget)
+                if timer:
+                    timer.lap('local_search')
+            i += 1
+
+            if self.arrays:
+                gen_best = float(curr.scores.min())
+            else:
+                gen_best = curr_gen[0][0]
+            history.append(gen_best)
+            if gen_best < best - self.min_gain:
+                stalled = 0
+            else:
+                stalled += 1
+            best = min(best, gen_best)
+            if self.observers:
+                if self.arrays:
+                    telemetry.report(self.observers, i - 1, timer,
+                                     curr.scores, curr.tours)
+                else:
+                    telemetry.report(self.observers, i - 1, timer,
+                                     [score for score, p in curr_gen],
+                                     [p for score, p in curr_gen])
+            if self.checkpoint and i % self.checkpoint_every == 0:
+                self._save(i, curr if self.arrays else curr_gen)
+
+        if profiler:
+            profiler.disable()
+        telemetry.end(self.observers)
+        if self.checkpoint and i > first_iter and i % self.checkpoint_every:
+            self._save(i, curr if self.arrays else curr_gen)
+        if self.arrays:
+            curr_gen = curr.to_pairs()
+        return Result(curr_gen, i, evaluations, time.perf_counter() - start,
+                      self.ls.time if self.ls else 0.0, history, stop_reason,
+                      self.cache.stats() if self.cache is not None else None)
+
+    # writes a checkpoint of curr (a Population or a list of (score,
+    # permutation) pairs) after generation i
+    def _save(self, i, curr):
+        if self.arrays:
+            save_checkpoint(self.checkpoint, curr.tours, curr.scores, i)
+        else:
+            save_checkpoint(self.checkpoint, [p for score, p in curr],
+                            [score for score, p in curr], i)
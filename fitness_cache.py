@@ -0,0 +1,96 @@
+# fitness_cache.py
+
+#
+# Memoized fitness for the genetic algorithms in tsp.py
+#
+# A FitnessCache wraps a distance backend and remembers the length of every
+# tour it scores, under a key that is the same for all rotations and both
+# directions of a tour.  Elites copied unchanged into the next generation,
+# and the duplicate children that appear as a population converges, are
+# then looked up instead of scored again.  The cache holds at most max_size
+# tours and evicts the least recently used one when full.
+#
+# The key is a 128-bit hash of the tour's set of (undirected) edges: two
+# independent sums, mod 2**64, of w[a]*w[b] over the tour's edges (a, b)
+# for fixed random 64-bit weights w.  Since it doesn't depend on where a
+# tour starts or which way it runs, a whole population is hashed with a
+# few array operations.
+#
+
+import collections
+
+import numpy as np
+
+
+class FitnessCache:
+    # dists is a backend from distance.make_distance; seed picks the hash
+    # weights, and has no effect on the scores
+    def __init__(self, dists, max_size=100000, seed=0):
+        self.dists = dists
+        self.n = dists.n
+        self.max_size = max_size
+        rng = np.random.default_rng(seed)
+        self.weights = rng.integers(0, 2**64, size=(2, self.n + 1),
+                                    dtype=np.uint64)
+        self.scores = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.scores)
+
+    # the fraction of lookups answered from the cache
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    # returns the keys of the rows of tours (a 2-D array of city names)
+    def keys(self, tours):
+        nxt = np.roll(tours, -1, axis=1)
+        h1, h2 = [(w[tours] * w[nxt]).sum(axis=1).tolist()
+                  for w in self.weights]
+        return list(zip(h1, h2))
+
+    def total_dist(self, city_perm):
+        return float(self.population_dists([city_perm])[0])
+
+    # returns a float64 array with the tour length of every permutation in
+    # perms, like a distance backend does, only scoring (as one batch) the
+    # tours that aren't cached yet.  A tour found in the cache gets the
+    # score of whichever rotation or direction of it was seen first, which
+    # can differ from its own in the last few bits.
+    def population_dists(self, perms):
+        tours = np.asarray(perms, dtype=np.intp).reshape(-1, self.n)
+        keys = self.keys(tours)
+        result = np.empty(len(keys))
+        missing = {}
+        for i, key in enumerate(keys):
+            score = self.scores.get(key)
+            if score is not None:
+                self.scores.move_to_end(key)
+                result[i] = score
+                self.hits += 1
+            elif key in missing:
+                # a duplicate of a tour earlier in the same batch
+                missing[key].append(i)
+                self.hits += 1
+            else:
+                missing[key] = [i]
+                self.misses += 1
+        if missing:
+            first = [where[0] for where in missing.values()]
+            scores = self.dists.population_dists(tours[first]).tolist()
+            for (key, where), score in zip(missing.items(), scores):
+                result[where] = score
+                self.scores[key] = score
+            while len(self.scores) > self.max_size:
+                self.scores.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self.scores),
+                'hit_rate': self.hit_rate}
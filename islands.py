@@ -0,0 +1,150 @@
+# islands.py
+
+#
+# Island-model genetic algorithm for the Traveling Salesman Problem
+#
+# Each island runs its own tournament selection search in a worker process.
+# Every migration_interval generations the islands stop, their best
+# permutations migrate to their neighbours in the migration topology, and a
+# global best is updated.  Every island has its own seeded random stream,
+# so a run depends only on its seed and not on how islands are scheduled
+# onto processes.  validation sets the level of permutation checks (see
+# validation.py) in the parent and every worker, and init and diversity
+# pick how the first populations are built (see tsp.initial_population).
+#
+
+import math
+import multiprocessing
+import os
+import random
+
+from crossover import PURE_CROSSOVERS
+from distance import make_distance
+from loaders import instance_metric
+from tsp import (initial_population, load_city_locs, score_population,
+                 tournament_generation)
+from validation import check, check_rows, set_level, validation_level
+
+# functions returning the islands that island i of k receives migrants from
+TOPOLOGIES = {
+    'ring': lambda i, k: [(i - 1) % k],
+    'full': lambda i, k: [j for j in range(k) if j != i],
+}
+
+
+# The best permutation found on any island so far.
+class GlobalBest:
+    def __init__(self):
+        self.score = math.inf
+        self.tour = None
+        self.island = None
+        self.generation = 0
+
+    # records tour if it beats the current best, and returns true if it did
+    def update(self, score, tour, island, generation):
+        if score >= self.score:
+            return False
+        self.score = score
+        self.tour = tour
+        self.island = island
+        self.generation = generation
+        return True
+
+
+# per-process state, set once by _init_worker so the distance matrix isn't
+# rebuilt or pickled for every task
+_city_locs = None
+_dists = None
+_cross = None
+
+
+def _init_worker(city_locs, metric, crossover, validation):
+    global _city_locs, _dists, _cross
+    set_level(validation)
+    _city_locs = city_locs
+    _dists = make_distance(city_locs, metric)
+    _cross = PURE_CROSSOVERS[crossover]
+
+# runs generations generations of one island, starting from its random state
+# and population (or from a fresh one built as init and diversity say, see
+# tsp.initial_population, if curr_gen is None), and returns the new random
+# state and population
+
+
+def _evolve(args):
+    state, curr_gen, pop_size, generations, seed_tour, init, diversity = args
+    random.setstate(state)
+    if curr_gen is None:
+        curr_gen = score_population(
+            initial_population(_city_locs, pop_size, init, diversity), _dists)
+        if seed_tour is not None:
+            curr_gen.append((_dists.total_dist(seed_tour), seed_tour))
+        curr_gen.sort()
+        curr_gen = curr_gen[:pop_size]
+    for i in range(generations):
+        curr_gen = tournament_generation(curr_gen, pop_size, _cross, _dists)
+        check_rows([p for score, p in curr_gen])
+    return random.getstate(), curr_gen
+
+# returns new populations in which the worst members of every island are
+# replaced by the best migrants permutations of each island it receives from
+
+
+def migrate(pops, topology, migrants):
+    sources = TOPOLOGIES[topology]
+    k = len(pops)
+    result = []
+    for i in range(k):
+        incoming = [(score, p[:]) for j in sources(i, k)
+                    for score, p in pops[j][:migrants]]
+        # the island always keeps its own best
+        incoming = incoming[:len(pops[i]) - 1]
+        curr_gen = pops[i][:len(pops[i]) - len(incoming)] + incoming
+        curr_gen.sort()
+        result.append(curr_gen)
+    return result
+
+
+def island_search(fname, max_iter, pop_size, islands=None,
+                  migration_interval=10, migrants=2, topology='ring',
+                  crossover='my_crossover', seed=0, seed_tour=None,
+                  processes=None, validation='sampled', init='random',
+                  diversity=0.5):
+    city_locs = load_city_locs(fname)
+    islands = islands or os.cpu_count()
+    processes = processes or min(islands, os.cpu_count())
+    if seed_tour is not None:
+        with validation_level(validation):
+            check(seed_tour, sample=False)
+    states = [random.Random(f'{seed}:{i}').getstate() for i in range(islands)]
+    pops = [None] * islands
+    best = GlobalBest()
+
+    print(
+        f'island_search("{fname}", max_iter={max_iter}, pop_size={pop_size}, islands={islands}, topology="{topology}") ...')
+    with multiprocessing.Pool(processes, initializer=_init_worker,
+                              initargs=(city_locs, instance_metric(fname),
+                                        crossover, validation)) as pool:
+        done = 0
+        while done < max_iter:
+            steps = min(migration_interval, max_iter - done)
+            results = pool.map(_evolve, [(states[i], pops[i], pop_size, steps,
+                                          seed_tour, init, diversity)
+                                         for i in range(islands)])
+            done += steps
+            for i, (state, curr_gen) in enumerate(results):
+                states[i] = state
+                pops[i] = curr_gen
+                best.update(curr_gen[0][0], curr_gen[0][1], i, done)
+            print(f'Iter {done}: best = {best.score} (island {best.island})')
+            if done < max_iter:
+                pops = migrate(pops, topology, migrants)
+
+    print()
+    print(
+        f'After {max_iter} generations of {islands} islands of {pop_size} permutations, the best is:')
+    print(f'score = {best.score}')
+    print(best.tour)
+    with validation_level(validation):
+        check(best.tour, sample=False)
+    return best.tour
@@ -0,0 +1,122 @@
+# loaders.py
+
+#
+# Loading Traveling Salesman Problem instances
+#
+# Two formats are understood: this project's own, with one "name x y" line
+# per city, and TSPLIB .tsp files with EDGE_WEIGHT_TYPE EUC_2D or GEO.
+# Either is parsed in bulk into an n x 2 float64 array, which is then
+# cached as a .npy file named after the SHA-1 of the source file, so later
+# loads of the same file just memory-map the cache.
+#
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# edge weight types that can be loaded, as named by TSPLIB
+METRICS = ('EUC_2D', 'GEO')
+
+# name of the cache directory, created next to the instance files
+CACHE_DIR = '.tspcache'
+
+# returns the SHA-1 of the contents of the file fname, as a hex string
+
+
+def file_hash(fname):
+    h = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# returns the TSPLIB header of the file fname as a dict, or an empty dict if
+# it isn't a TSPLIB file
+
+
+def tsplib_header(fname):
+    header = {}
+    with open(fname) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.endswith('_SECTION') or line == 'EOF':
+                break
+            key, sep, value = line.partition(':')
+            if not sep:
+                # a line of coordinates: not a TSPLIB file
+                return {}
+            header[key.strip().upper()] = value.strip()
+    return header
+
+# returns the edge weight type of the instance in fname, which is EUC_2D for
+# anything but a TSPLIB GEO file
+
+
+def instance_metric(fname):
+    return tsplib_header(fname).get('EDGE_WEIGHT_TYPE', 'EUC_2D')
+
+
+def parse_cities(fname):
+    with open(fname) as f:
+        data = np.array(f.read().split(), dtype=np.float64)
+    return data.reshape(-1, 3)[:, 1:].copy()
+
+
+def parse_tsplib(fname):
+    header = tsplib_header(fname)
+    metric = header.get('EDGE_WEIGHT_TYPE')
+    if metric not in METRICS:
+        raise ValueError(f'{fname}: unsupported EDGE_WEIGHT_TYPE {metric}')
+    n = int(header['DIMENSION'])
+    with open(fname) as f:
+        text = f.read()
+    start = text.index('NODE_COORD_SECTION') + len('NODE_COORD_SECTION')
+    end = text.find('EOF', start)
+    data = np.array(text[start:end if end >= 0 else None].split(),
+                    dtype=np.float64).reshape(-1, 3)[:n]
+    if len(data) != n:
+        raise ValueError(f'{fname}: expected {n} cities, found {len(data)}')
+    # TSPLIB numbers the nodes, but doesn't promise to list them in order
+    return data[np.argsort(data[:, 0], kind='stable'), 1:].copy()
+
+# writes array to path via a temporary file, so readers never see a partial
+# file
+
+
+def _save_atomic(path, array):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+# returns the coordinates of the cities in fname as an n x 2 float64 array
+# (memory-mapped and read-only when it comes from the cache); with
+# cache=False the file is always parsed and no cache is written
+
+
+def load_coords(fname, cache=True):
+    if not cache:
+        if tsplib_header(fname):
+            return parse_tsplib(fname)
+        return parse_cities(fname)
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(fname)),
+                             CACHE_DIR)
+    path = os.path.join(cache_dir, file_hash(fname) + '.npy')
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r')
+    coords = load_coords(fname, cache=False)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save_atomic(path, coords)
+    except OSError:
+        # a read-only directory just means no cache
+        pass
+    return coords
@@ -0,0 +1,277 @@
+# local_search.py
+
+#
+# 2-opt and Or-opt local search for the Traveling Salesman Problem
+#
+# Moves are only tried between a city and its k nearest neighbours, and
+# each city has a "don't look" bit that stays set until a move touches one
+# of its tour neighbours, so a sweep costs about O(n*k) instead of O(n*n).
+# LocalSearch.improve_population runs it over a GA population under a time
+# budget, which turns the searches in tsp.py into a memetic algorithm.
+#
+
+import collections
+import math
+import random
+import time
+
+import numpy as np
+
+from construct import KDTree
+from distance import CoordDistance, DistanceMatrix, GeoDistance
+from validation import is_good_perm
+
+# moves must gain at least this much, so rounding errors can't cause cycles
+EPS = 1e-9
+
+# returns a list whose entry c (for each city name c from 1 to n) is the
+# list of the k cities closest to c, nearest first; coords is an n x 2 array.
+# The lists come from a construct.KDTree, so building them takes about
+# O(n*k*log n) time rather than computing all n*n distances.
+
+
+def neighbor_lists(coords, k):
+    n = len(coords)
+    k = min(k, n - 1)
+    result = [[]]
+    if k < 1:
+        return result + [[] for i in range(n)]
+    tree = KDTree(coords)
+    for i in range(n):
+        result.append([j + 1 for j in tree.nearest(i, k)])
+    return result
+
+
+class LocalSearch:
+    # dists is a backend from distance.make_distance; k is the length of the
+    # candidate lists
+    def __init__(self, dists, k=8):
+        self.dists = dists
+        self.xs = [0.0] + dists.coords[:, 0].tolist()
+        self.ys = [0.0] + dists.coords[:, 1].tolist()
+        self.neighbors = neighbor_lists(dists.coords, k)
+        if not dists.euclidean:
+            # candidate lists stay planar, but moves are judged by the
+            # instance's own metric
+            self.d = dists.city_dist
+        # seconds spent in improve_population, so callers can report it
+        self.time = 0.0
+        # tours known to be local optima, keyed by id (the dict keeps them
+        # alive, so ids can't be reused)
+        self._optimal = {}
+
+    def d(self, c1, c2):
+        dx = self.xs[c1] - self.xs[c2]
+        dy = self.ys[c1] - self.ys[c2]
+        return math.sqrt(dx*dx + dy*dy)
+
+    # reverses the cities at positions i to j of tour (going forward, and
+    # wrapping around the end), or equivalently the rest of the tour if that
+    # is shorter, keeping pos up to date
+    def _reverse(self, tour, pos, i, j):
+        n = len(tour)
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            length = n - length
+        for step in range(length // 2):
+            a, b = tour[i], tour[j]
+            tour[i], tour[j] = b, a
+            pos[b], pos[a] = i, j
+            i = (i + 1) % n
+            j = (j - 1) % n
+
+    # tries a 2-opt move that adds an edge from a to one of its neighbours;
+    # returns the cities whose tour neighbours changed, or None
+    def _two_opt(self, tour, pos, a):
+        n = len(tour)
+        d = self.d
+        for forward in (True, False):
+            if forward:
+                b = tour[(pos[a] + 1) % n]
+            else:
+                b = tour[pos[a] - 1]
+            dab = d(a, b)
+            for c in self.neighbors[a]:
+                dac = d(a, c)
+                if dac >= dab:
+                    break
+                if forward:
+                    e = tour[(pos[c] + 1) % n]
+                else:
+                    e = tour[pos[c] - 1]
+                if c == b or e == a:
+                    continue
+                if dac + d(b, e) - dab - d(c, e) < -EPS:
+                    if forward:
+                        self._reverse(tour, pos, pos[b], pos[c])
+                    else:
+                        self._reverse(tour, pos, pos[a], pos[e])
+                    return a, b, c, e
+        return None
+
+    # tries an Or-opt move of the segment of 1 to 3 cities starting at a to
+    # somewhere next to one of a's neighbours, possibly reversed; returns the
+    # cities whose tour neighbours changed, or None
+    def _or_opt(self, tour, pos, a):
+        n = len(tour)
+        d = self.d
+        i = pos[a]
+        for length in (1, 2, 3):
+            if length + 2 >= n:
+                break
+            seg = [tour[(i + k) % n] for k in range(length)]
+            last = seg[-1]
+            p = tour[i - 1]
+            nx = tour[(i + length) % n]
+            removed = d(p, a) + d(last, nx) - d(p, nx)
+            for c in self.neighbors[a]:
+                if d(c, a) >= removed:
+                    break
+                if c in seg:
+                    continue
+                # try both sides of c: between (c, succ c) and (pred c, c)
+                for e in (tour[(pos[c] + 1) % n], tour[pos[c] - 1]):
+                    if e in seg:
+                        continue
+                    # a goes next to c, so the segment keeps its direction
+                    # after c and is reversed before it
+                    added = d(c, a) + d(last, e) - d(c, e)
+                    if added < removed - EPS:
+                        if e == tour[(pos[c] + 1) % n]:
+                            self._move(tour, pos, i, seg, c, e)
+                        else:
+                            self._move(tour, pos, i, seg[::-1], e, c)
+                        return p, nx, a, last, c, e
+        return None
+
+    # moves the segment of cities at positions i, i+1, ... of tour so that
+    # the cities ins (the segment, possibly reversed) come between x and its
+    # successor y.  Only the cities between the segment's old and new places
+    # are shifted, going whichever way round the tour is shorter, and pos is
+    # kept up to date.
+    def _move(self, tour, pos, i, ins, x, y):
+        n = len(tour)
+        length = len(ins)
+        # cities from the one after the segment up to x, and from y up to the
+        # one before the segment
+        after = (pos[x] - i - length) % n + 1
+        before = n - length - after
+        if after <= before:
+            for m in range(after):
+                c = tour[(i + length + m) % n]
+                tour[(i + m) % n] = c
+                pos[c] = (i + m) % n
+            start = i + after
+        else:
+            for m in range(before):
+                c = tour[(i - 1 - m) % n]
+                tour[(i + length - 1 - m) % n] = c
+                pos[c] = (i + length - 1 - m) % n
+            start = i - before
+        for m, c in enumerate(ins):
+            tour[(start + m) % n] = c
+            pos[c] = (start + m) % n
+
+    # improves tour in place with 2-opt and Or-opt moves until it is a local
+    # optimum or time.perf_counter() passes deadline; returns the change in
+    # tour length and whether a local optimum was reached
+    def improve(self, tour, deadline=None):
+        n = len(tour)
+        if n < 5:
+            return 0.0, True
+        before = self.dists.total_dist(tour)
+        pos = [0] * (n + 1)
+        for i, c in enumerate(tour):
+            pos[c] = i
+        queue = collections.deque(tour)
+        queued = bytearray([1]) * (n + 1)
+        while queue:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return self.dists.total_dist(tour) - before, False
+            a = queue.popleft()
+            queued[a] = 0
+            touched = self._two_opt(tour, pos, a) or self._or_opt(tour, pos, a)
+            if touched:
+                for c in touched:
+                    if not queued[c]:
+                        queued[c] = 1
+                        queue.append(c)
+        return self.dists.total_dist(tour) - before, True
+
+    # improves the members of curr_gen (a sorted list of (score, permutation)
+    # pairs), best first, until budget seconds have passed, and returns the
+    # resulting population, sorted; the permutations in curr_gen are not
+    # modified
+    def improve_population(self, curr_gen, budget):
+        start = time.perf_counter()
+        deadline = start + budget
+        alive = {id(p) for score, p in curr_gen}
+        self._optimal = {i: p for i, p in self._optimal.items() if i in alive}
+
+        result = []
+        changed = []
+        for score, p in curr_gen:
+            if id(p) in self._optimal or time.perf_counter() >= deadline:
+                result.append((score, p))
+                continue
+            q = p[:]
+            gain, optimal = self.improve(q, deadline)
+            if gain < -EPS:
+                changed.append(q)
+            else:
+                result.append((score, p))
+                q = p
+            if optimal:
+                self._optimal[id(q)] = q
+
+        if changed:
+            scores = self.dists.population_dists(changed).tolist()
+            result.extend(zip(scores, changed))
+        result.sort()
+        self.time += time.perf_counter() - start
+        return result
+
+    # improves the rows of pop (a population.Population) in place, like
+    # improve_population: best first, until budget seconds have passed.  The
+    # rows' optimal flags stand in for the ids of known local optima, since
+    # the rows are reused from generation to generation.
+    def improve_rows(self, pop, budget):
+        start = time.perf_counter()
+        deadline = start + budget
+        changed = []
+        for r in np.argsort(pop.scores, kind='stable').tolist():
+            if pop.optimal[r] or time.perf_counter() >= deadline:
+                continue
+            q = pop.tours[r].tolist()
+            gain, optimal = self.improve(q, deadline)
+            if gain < -EPS:
+                pop.tours[r] = q
+                changed.append(r)
+            pop.optimal[r] = optimal
+        if changed:
+            pop.scores[changed] = self.dists.population_dists(
+                pop.tours[changed])
+        self.time += time.perf_counter() - start
+
+# builds a LocalSearch on every kind of distance backend and checks that it
+# turns a random tour into a shorter permutation of the same cities
+
+
+def test():
+    rng = random.Random(0)
+    # small enough to be valid GEO coordinates too
+    city_locs = [(rng.uniform(-60, 60), rng.uniform(-150, 150))
+                 for i in range(200)]
+    for backend in (DistanceMatrix, CoordDistance, GeoDistance):
+        dists = backend(city_locs)
+        tour = list(range(1, dists.n + 1))
+        rng.shuffle(tour)
+        gain, optimal = LocalSearch(dists).improve(tour)
+        assert is_good_perm(tour) and len(tour) == dists.n
+        assert gain < 0 and optimal, backend.__name__
+        print(f'{backend.__name__}: ok')
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,128 @@
+# moves.py
+
+#
+# Mutation moves with constant-time fitness updates
+#
+# Every move in MOVES changes tour (a list or 1-D array of city names) in
+# place and returns a pair (removed, added) of lists of edges, where an edge
+# is a pair of city names.  Since only a handful of edges change, the new tour length is the parent's
+# length plus delta(removed, added, dists), with no need to re-score the
+# whole tour.  Scores updated this way can drift from total_dist by a few
+# ulps per move.
+#
+
+import random
+
+from distance import make_distance
+
+# returns the (cyclic) edges of tour that start at the positions in starts
+
+
+def _edges_at(tour, starts):
+    n = len(tour)
+    return [(tour[k], tour[(k+1) % n]) for k in starts]
+
+# swaps the cities at positions i and j
+
+
+def swap(tour, i, j):
+    n = len(tour)
+    starts = sorted({(i-1) % n, i, (j-1) % n, j})
+    removed = _edges_at(tour, starts)
+    tour[i], tour[j] = tour[j], tour[i]
+    return removed, _edges_at(tour, starts)
+
+# reverses the segment tour[i..j] (inclusive), i.e. a 2-opt move
+
+
+def two_opt(tour, i, j):
+    if i > j:
+        i, j = j, i
+    n = len(tour)
+    starts = sorted({(i-1) % n, j})
+    removed = _edges_at(tour, starts)
+    tour[i:j+1] = tour[i:j+1][::-1]
+    return removed, _edges_at(tour, starts)
+
+# moves the city at position i so that it ends up at position j
+
+
+def insertion(tour, i, j):
+    n = len(tour)
+    if i == j or n < 3:
+        return [], []
+
+    # the city at position k once the one at i is taken out
+    def rest(k):
+        k %= n - 1
+        return tour[k if k < i else k + 1]
+
+    c = tour[i]
+    prev, nxt = rest(i - 1), rest(i)
+    a, b = rest(j - 1), rest(j)
+    if i < j:
+        tour[i:j] = tour[i+1:j+1]
+    else:
+        tour[j+1:i+1] = tour[j:i]
+    tour[j] = c
+    removed = [(prev, c), (c, nxt), (a, b)]
+    added = [(prev, nxt), (a, c), (c, b)]
+    return removed, added
+
+# returns the change in tour length from swapping removed edges for added
+# ones; dists is a backend from distance.make_distance
+
+
+def delta(removed, added, dists):
+    return (sum(dists.city_dist(a, b) for a, b in added) -
+            sum(dists.city_dist(a, b) for a, b in removed))
+
+
+# swaps two random cities of lst in place, the cheap mutation the crossovers
+# use; unlike the moves below it doesn't report the edges it changed (see
+# rand_move for that)
+
+
+def rand_swap(lst):
+    n = len(lst)
+    i, j = random.randrange(n), random.randrange(n)
+    lst[i], lst[j] = lst[j], lst[i]  # swap lst[i] and lst[j]
+
+
+MOVES = {
+    'swap': swap,
+    '2opt': two_opt,
+    'insertion': insertion,
+}
+
+# applies the move named kind at random positions of tour, whose length is
+# score, and returns the new length
+
+
+def rand_move(tour, score, dists, kind='swap'):
+    n = len(tour)
+    i, j = random.randrange(n), random.randrange(n)
+    removed, added = MOVES[kind](tour, i, j)
+    return score + delta(removed, added, dists)
+
+# checks that rand_move keeps track of the tour length for every move
+
+
+def test():
+    rng = random.Random(0)
+    city_locs = [(rng.uniform(0, 1000), rng.uniform(0, 1000))
+                 for i in range(50)]
+    dists = make_distance(city_locs)
+    for kind in MOVES:
+        tour = list(range(1, 51))
+        random.shuffle(tour)
+        score = dists.total_dist(tour)
+        for i in range(1000):
+            score = rand_move(tour, score, dists, kind)
+            assert sorted(tour) == list(range(1, 51))
+            assert abs(score - dists.total_dist(tour)) < 1e-6, kind
+        print(f'{kind}: ok')
+
+
+if __name__ == '__main__':
+    test()
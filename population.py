@@ -0,0 +1,158 @@
+# population.py
+
+#
+# Array-backed populations for the genetic algorithms in tsp.py
+#
+# A Population keeps its permutations as the rows of one contiguous
+# (pop_size, n) int32 array and their tour lengths in a float64 vector.
+# A generation writes its children straight into the rows of a second,
+# preallocated Population and the two are then swapped, so no lists or
+# (score, permutation) tuples are built per individual, and selection only
+# partially orders the scores with argpartition instead of sorting them.
+#
+
+import random
+
+import numpy as np
+
+from crossover import rand_swap_row
+
+
+class Population:
+    def __init__(self, pop_size, n):
+        self.tours = np.zeros((pop_size, n), dtype=np.int32)
+        self.scores = np.full(pop_size, np.inf)
+        # rows local search has found to be local optima (see
+        # local_search.LocalSearch.improve_rows)
+        self.optimal = np.zeros(pop_size, dtype=bool)
+        # spare row for children that don't fit in the population
+        self.scratch = np.zeros(n, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.tours)
+
+    # returns a Population holding perms, scored with dists
+    @classmethod
+    def from_perms(cls, perms, dists):
+        result = cls(len(perms), len(perms[0]))
+        result.tours[:] = perms
+        result.score(dists)
+        return result
+
+    # returns a Population holding the (score, permutation) pairs in pairs
+    @classmethod
+    def from_pairs(cls, pairs):
+        result = cls(len(pairs), len(pairs[0][1]))
+        result.load_pairs(pairs)
+        return result
+
+    def load_pairs(self, pairs):
+        for i, (score, p) in enumerate(pairs):
+            self.scores[i] = score
+            self.tours[i] = p
+        self.optimal[:] = False
+
+    # returns the population as a sorted list of (score, permutation) pairs,
+    # like the list-based searches in tsp.py use
+    def to_pairs(self):
+        order = np.argsort(self.scores, kind='stable')
+        return list(zip(self.scores[order].tolist(),
+                        self.tours[order].tolist()))
+
+    # scores the rows before end (all of them if None) with dists
+    def score(self, dists, end=None):
+        self.scores[:end] = dists.population_dists(self.tours[:end])
+
+    def best(self):
+        return int(np.argmin(self.scores))
+
+    # returns the indexes of the k best rows, in no particular order
+    def top(self, k):
+        if k == 1:
+            return np.array([self.best()])
+        if k >= len(self.scores):
+            return np.arange(len(self.scores))
+        return np.argpartition(self.scores, k - 1)[:k]
+
+# Selection strategies: each returns the index of one parent, picked from
+# pool (a list of row indexes) using the scores of those rows
+
+# returns the better of two random members of pool
+
+
+def binary_tournament(pool, scores):
+    i = random.choice(pool)
+    j = random.choice(pool)
+    if scores[i] < scores[j]:
+        return i
+    return j
+
+# returns a random member of pool, whatever its score
+
+
+def uniform(pool, scores):
+    return random.choice(pool)
+
+# writes the generation after curr into nxt: the elites best rows of curr
+# are copied over unchanged and the rest are offspring of parents picked by
+# select from the pool_size best rows; cross is a *_into crossover, whose
+# children are then mutated with mutate, and timer an optional
+# telemetry.PhaseTimer.  The last mutants rows are instead copies of single
+# parents changed by move (see engine.delta_mutation), which are scored from
+# their parent's score rather than by dists.
+
+
+def generation(curr, nxt, select, pool_size, elites, cross, dists,
+               mutate=rand_swap_row, timer=None, mutants=0, move=None):
+    pop_size = len(curr)
+    children = pop_size - mutants
+    pool = curr.top(pool_size).tolist()
+    keep = pool if elites == pool_size else curr.top(elites)
+    nxt.tours[:elites] = curr.tours[keep]
+    nxt.optimal[:elites] = curr.optimal[keep]
+    nxt.optimal[elites:] = False
+    if timer:
+        timer.lap('sort')
+    for j in range(elites, children, 2):
+        s = select(pool, curr.scores)
+        t = select(pool, curr.scores)
+        if timer:
+            timer.lap('selection')
+        first = nxt.tours[j]
+        second = nxt.tours[j + 1] if j + 1 < children else nxt.scratch
+        cross(curr.tours[s], curr.tours[t], first, second)
+        if timer:
+            timer.lap('crossover')
+        mutate(first)
+        mutate(second)
+        if timer:
+            timer.lap('mutation')
+    nxt.score(dists, children)
+    if timer:
+        timer.lap('evaluation')
+    for j in range(children, pop_size):
+        s = select(pool, curr.scores)
+        nxt.tours[j] = curr.tours[s]
+        nxt.scores[j] = move(nxt.tours[j], float(curr.scores[s]))
+    if mutants and timer:
+        timer.lap('mutation')
+
+# writes the generation after curr into nxt, like tsp.tournament_generation:
+# the best of curr is kept and the rest are offspring of parents picked by
+# binary tournaments from the top 67%
+
+
+def tournament_generation(curr, nxt, cross, dists, mutate=rand_swap_row,
+                          timer=None):
+    pop_size = len(curr)
+    generation(curr, nxt, binary_tournament, max(1, int(pop_size*2/3)), 1,
+               cross, dists, mutate, timer)
+
+# writes the generation after curr into nxt, like tsp.crossover_search does:
+# the top 50% are copied and the rest are offspring of random pairs of them
+
+
+def crossover_generation(curr, nxt, cross, dists, mutate=rand_swap_row,
+                         timer=None):
+    k = max(1, int(len(curr)/2))
+    generation(curr, nxt, uniform, k, k, cross, dists, mutate, timer)
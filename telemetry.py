@@ -0,0 +1,160 @@
+# telemetry.py
+
+#
+# Per-generation telemetry for the genetic algorithms in tsp.py
+#
+# The searches take a list of observers.  After every generation each
+# observer's on_generation is called with a dict of statistics: the time
+# spent in each phase of the generation, the best, mean and worst score and
+# the population's edge diversity.  on_end is called once the search is
+# over; the sinks writing to files only flush them then, and are closed by
+# whoever made them, so the same sink can follow several searches in turn.
+# With no observers, no timing or statistics are computed at all.
+#
+
+import cProfile
+import csv
+import io
+import json
+import pstats
+import time
+
+import numpy as np
+
+PHASES = ('selection', 'crossover', 'mutation', 'evaluation', 'sort',
+          'local_search')
+
+
+# Accumulates the time spent in each phase of a generation.  Call start()
+# at the beginning of the generation, then lap(phase) at the end of each
+# stretch of work, which charges the time since the previous call to phase.
+class PhaseTimer:
+    def __init__(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self._last = time.perf_counter()
+
+    def start(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.times[phase] += now - self._last
+        self._last = now
+
+# returns the average fraction of edges of the tours (rows of a 2-D array of
+# city names) that the tour best doesn't have: 0 when every tour uses the
+# same edges as best, and close to 1 for unrelated random tours
+
+
+def edge_diversity(tours, best):
+    tours = np.asarray(tours)
+    best = np.asarray(best)
+    n = len(best)
+    succ = np.empty(n + 1, dtype=np.int64)
+    succ[best] = np.roll(best, -1)
+    nxt = np.roll(tours, -1, axis=1)
+    shared = (succ[tours] == nxt) | (succ[nxt] == tours)
+    return float(1.0 - shared.mean())
+
+# calls on_generation on every observer with the statistics of generation,
+# whose permutations are the rows of tours and whose times were recorded by
+# timer
+
+
+def report(observers, generation, timer, scores, tours):
+    scores = np.asarray(scores)
+    best = int(np.argmin(scores))
+    stats = {'generation': generation}
+    stats.update(timer.times)
+    stats['total'] = sum(timer.times.values())
+    stats['best'] = float(scores[best])
+    stats['mean'] = float(scores.mean())
+    stats['worst'] = float(scores.max())
+    stats['diversity'] = edge_diversity(tours, np.asarray(tours)[best])
+    for observer in observers:
+        observer.on_generation(stats)
+
+
+def end(observers):
+    for observer in observers:
+        observer.on_end()
+
+
+# Base class for observers; subclasses override what they need.
+class Observer:
+    def on_generation(self, stats):
+        pass
+
+    def on_end(self):
+        pass
+
+
+# Base class for observers writing to a file, opened by the constructor.
+# on_end only flushes it, so one sink can record several runs in a row; the
+# caller closes it with close() or by using the sink in a with block.
+class FileSink(Observer):
+    def __init__(self, path, newline=None):
+        self.f = open(path, 'w', newline=newline)
+
+    def on_end(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Writes each generation's statistics as one JSON object per line.
+class JsonlSink(FileSink):
+    def on_generation(self, stats):
+        self.f.write(json.dumps(stats) + '\n')
+
+
+# Writes each generation's statistics as a row of a CSV file.
+class CsvSink(FileSink):
+    def __init__(self, path):
+        super().__init__(path, newline='')
+        self.writer = None
+
+    def on_generation(self, stats):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.f, fieldnames=list(stats))
+            self.writer.writeheader()
+        self.writer.writerow(stats)
+
+
+# Keeps every generation's statistics in memory, e.g. for a notebook.
+class History(Observer):
+    def __init__(self):
+        self.rows = []
+
+    def on_generation(self, stats):
+        self.rows.append(stats)
+
+
+# Runs the search under cProfile: enable() before the generation loop and
+# disable() after it.  If path is given the raw profile is dumped there
+# (for snakeviz, pstats and friends); the top lines are printed either way.
+class Profiler:
+    def __init__(self, path=None, lines=20):
+        self.path = path
+        self.lines = lines
+        self.profile = cProfile.Profile()
+
+    def enable(self):
+        self.profile.enable()
+
+    def disable(self):
+        self.profile.disable()
+        if self.path:
+            self.profile.dump_stats(self.path)
+        out = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=out)
+        stats.sort_stats('cumulative').print_stats(self.lines)
+        print(out.getvalue())
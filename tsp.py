@@ -7,24 +7,29 @@
 import math
 import random
 
-# returns true if lst is a permutation of the ints 1 to len(lst), and false
-# otherwise
-
-
-def is_good_perm(lst):
-    return sorted(lst) == list(range(1, len(lst) + 1))
+import numpy as np
+
+import construct
+import engine
+import population
+from checkpoint import load_checkpoint
+from distance import make_distance
+from engine import Engine
+from loaders import instance_metric, load_coords
+from moves import rand_swap
+from validation import check, is_good_perm
 
 # returns a list of pairs of coordinates, where the first pair is the location
 # of the first city, the second pair is the location of second city, and so on
+# (see loaders.load_coords for the formats understood); whole-number
+# coordinates come back as ints
 
 
 def load_city_locs(fname):
-    f = open(fname)
-    result = []
-    for line in f:
-        data = [int(s) for s in line.split(' ')]
-        result.append(tuple(data[1:]))
-    return result
+    coords = load_coords(fname)
+    if np.array_equal(coords, np.trunc(coords)):
+        coords = coords.astype(np.int64)
+    return [tuple(p) for p in coords.tolist()]
 
 # returns the distance between points (x1,y1) and (x2,y2)
 
@@ -49,7 +54,7 @@ def city_dist(c1, c2, city_locs):
 
 
 def total_dist(city_perm, city_locs):
-    assert is_good_perm(city_perm), f'city_perm={city_perm}'
+    check(city_perm)
     n = len(city_perm)
     total = city_dist(city_perm[0], city_perm[n-1], city_locs)
     for i in range(1, n):
@@ -57,6 +62,35 @@ def total_dist(city_perm, city_locs):
     return total
 
 
+# scores every permutation in perms as one batch with dists (a backend from
+# distance.make_distance) and returns the list of (score, permutation) pairs
+
+
+def score_population(perms, dists):
+    scores = dists.population_dists(perms).tolist()
+    return list(zip(scores, perms))
+
+
+# prints the best tour of result (an engine.Result) from a search of
+# pop_size permutations
+
+
+def print_result(result, pop_size):
+    print()
+    if result.stop_reason != 'max_iter':
+        print(f'Stopped early ({result.stop_reason}).')
+    print(
+        f'After {result.generations} generations of {pop_size} permutations, the best is:')
+    print(f'score = {result.best_score}')
+    if result.ls_time:
+        print(f'local search: {result.ls_time:.2f}s of {result.elapsed:.2f}s '
+              f'({100 * result.ls_time / result.elapsed:.1f}%)')
+    if result.cache_stats:
+        print(f'fitness cache: {100 * result.cache_stats["hit_rate"]:.1f}% '
+              f'hits, {result.evaluations} tours scored')
+    print(result.best_tour)
+
+
 def str_lst(lst):
     return ', '.join(str(i) for i in lst)
 
@@ -73,16 +107,22 @@ def rand_perm(n):
     random.shuffle(result)
     return result
 
+# returns pop_size permutations of the cities in city_locs to start a search
+# from: random ones if init is 'random', or else tours built by the
+# construction heuristic named init (see construct.METHODS), varied by
+# diversity (see construct.population)
+
 
-def rand_swap(lst):
-    n = len(lst)
-    i, j = random.randrange(n), random.randrange(n)
-    lst[i], lst[j] = lst[j], lst[i]  # swap lst[i] and lst[j]
+def initial_population(city_locs, pop_size, init='random', diversity=0.5):
+    if init == 'random':
+        return [rand_perm(len(city_locs)) for i in range(pop_size)]
+    assert init in construct.METHODS, f'unknown init {init!r}'
+    return construct.population(city_locs, pop_size, init, diversity)
 
 
 def my_crossover(s, t):
-    assert is_good_perm(s)
-    assert is_good_perm(t)
+    check(s)
+    check(t)
     assert len(s) == len(t)
     n = len(s)
 
@@ -112,8 +152,8 @@ def my_crossover(s, t):
                 i += 1
             j += 1
 
-    assert is_good_perm(first_offspring)
-    assert is_good_perm(second_offspring)
+    check(first_offspring)
+    check(second_offspring)
     rand_swap(first_offspring)
     rand_swap(second_offspring)
     return first_offspring, second_offspring
@@ -121,8 +161,8 @@ def my_crossover(s, t):
 
 # Ammar Al-Dallal
 def tpxwr(s, t):
-    assert is_good_perm(s)
-    assert is_good_perm(t)
+    check(s)
+    check(t)
     assert len(s) == len(t)
     n = len(s)
 
@@ -175,8 +215,8 @@ def tpxwr(s, t):
     first_offspring = a + e + c
     second_offspring = d + b + f
 
-    assert is_good_perm(first_offspring)
-    assert is_good_perm(second_offspring)
+    check(first_offspring)
+    check(second_offspring)
     # random mutation, uncomment to use
     rand_swap(first_offspring)
     rand_swap(second_offspring)
@@ -201,161 +241,109 @@ def test():
 
 # Each generation, pairs of permutations from the top 50% of the population
 # are "bred" to create the next generation.
-
-
-def crossover_search(fname, max_iter, pop_size):
+#
+# In all the searches below, crossover is the name of an operator in
+# crossover.CROSSOVERS, and a nonzero ls_budget spends up to that many seconds
+# per generation improving the population with 2-opt and Or-opt moves.
+# With arrays=True the population is kept in a population.Population instead
+# of a list of (score, permutation) pairs.  observers are telemetry.Observer
+# instances notified after every generation, and profile=True (or the name
+# of a file to dump the profile to) runs the generations under cProfile.
+# Besides max_iter, a search stops after time_limit seconds, max_evals tour
+# evaluations or patience generations without improvement, if given, and a
+# nonzero cache_size memoizes the scores of up to that many tours.
+# validation is 'off', 'sampled' or 'full' (see validation.py) for how
+# often tours are checked to be permutations.  The first population is
+# random, or with init set to one of construct.METHODS, tours built by that
+# heuristic (see initial_population).  See engine.Engine for more control.
+# They all return an engine.Result.
+
+
+def crossover_search(fname, max_iter, pop_size, crossover='tpxwr', ls_budget=0, arrays=False, observers=(), profile=False, time_limit=None, max_evals=None, patience=None, cache_size=0, validation='sampled', init='random', diversity=0.5):
     city_locs = load_city_locs(fname)
-    n = len(city_locs)
-    curr_gen = [rand_perm(n) for i in range(pop_size)]
-    curr_gen = [(total_dist(p, city_locs), p) for p in curr_gen]
-    curr_gen.sort()
-    assert len(curr_gen) == pop_size
+    curr_gen = initial_population(city_locs, pop_size, init, diversity)
+    dists = make_distance(city_locs, instance_metric(fname))
 
     print(
         f'crossover_search("{fname}", max_iter={max_iter}, pop_size={pop_size}) ...')
-    for i in range(max_iter):
-        # copy the top 50% of the population to the next generation, and for the rest randomly
-        # cross-breed pairs
-
-        top_half = [p[1] for p in curr_gen[:int(n/2)]]
-        next_gen = top_half[:]
-        while len(next_gen) < pop_size:
-            s = random.choice(top_half)
-            t = random.choice(top_half)
-            first, second = tpxwr(s, t)
-            next_gen.append(first)
-            next_gen.append(second)
-
-        next_gen = next_gen[:pop_size]
-
-        # create the next generation of (score, permutations) pairs
-        assert len(next_gen) == pop_size
-        curr_gen = [(total_dist(p, city_locs), p) for p in next_gen]
-        curr_gen.sort()
-        if i % 50 == 0:
-            print(f'Iter {i} being simulated...')
-
-    print()
-    print(
-        f'After {max_iter} generations of {pop_size} permutations, the best is:')
-    print(f'score = {curr_gen[0][0]}')
-    print(curr_gen[0][1])
-    assert is_good_perm(curr_gen[0][1])
-
-
-def tournament_selection_search(fname, max_iter, pop_size):
-    city_locs = load_city_locs(fname)
-    n = len(city_locs)
-    curr_gen = [rand_perm(n) for i in range(pop_size)]
-    curr_gen = [(total_dist(p, city_locs), p) for p in curr_gen]
-    curr_gen.sort()
-    curr_gen = curr_gen[:pop_size]
-    assert len(curr_gen) == pop_size
+    # copy the top 50% of the population to the next generation, and for the
+    # rest randomly cross-breed pairs
+    ga = Engine(dists, pop_size, crossover=crossover, selection='truncation',
+                elites=int(pop_size/2), arrays=arrays, ls_budget=ls_budget,
+                max_iter=max_iter, time_limit=time_limit, max_evals=max_evals,
+                patience=patience, observers=observers, profile=profile,
+                print_every=50, cache_size=cache_size,
+                validation=validation)
+    result = ga.run(curr_gen)
+    print_result(result, pop_size)
+    return result
 
-    print(
-        f'tournament_selection_search("{fname}", max_iter={max_iter}, pop_size={pop_size}) ...')
-    for i in range(max_iter):
-        if i % 10 == 0:
-            print(f'Iter {i} being simulated...')
-        # binary tournament selection from top 67% to populate new generation to find parents
-        # parents are then cross-bred
-        # best of current gen is retained, the rest of the population will be offsprings
-
-        top_two_third = [p for p in curr_gen[:int(n*2/3)]]
-        next_gen = []
-        next_gen.append(curr_gen[0][1])
-        for j in range(int(pop_size/2)):
-            s1 = random.choice(top_two_third)
-            s2 = random.choice(top_two_third)
-            if s1[0] < s2[0]:
-                s = s1[1]
-            else:
-                s = s2[1]
-            
-            t1 = random.choice(top_two_third)
-            t2 = random.choice(top_two_third)
-            if t1[0] < t2[0]:
-                t = t1[1]
-            else:
-                t = t2[1]
-            first, second = my_crossover(s,t)
-            next_gen.append(first)
-            next_gen.append(second)            
-
-        next_gen = next_gen[:pop_size]
-        #
-        #  create the next generation of (score, permutations) pairs
-        assert len(next_gen) == pop_size
-        curr_gen = [(total_dist(p, city_locs), p) for p in next_gen]
-        curr_gen.sort()
 
+# returns the generation after curr_gen (a sorted list of (score, permutation)
+# pairs) in a tournament selection search, also sorted; cross is a crossover
+# from crossover.PURE_CROSSOVERS, whose children are then mutated with
+# mutate, and dists a backend from distance.make_distance; timer is an
+# optional telemetry.PhaseTimer
 
-    print()
-    print(
-        f'After {max_iter} generations of {pop_size} permutations, the best is:')
-    print(f'score = {curr_gen[0][0]}')
-    print(curr_gen[0][1])
-    assert is_good_perm(curr_gen[0][1])
 
+def tournament_generation(curr_gen, pop_size, cross, dists, mutate=rand_swap, timer=None):
+    # binary tournament selection from top 67% to populate new generation to find parents
+    # parents are then cross-bred
+    # best of current gen is retained, the rest of the population will be offsprings
+    return engine.generation(curr_gen, pop_size, population.binary_tournament,
+                             max(1, int(pop_size*2/3)), 1, cross, dists,
+                             mutate, timer)
 
 
-# Tournament selection search but the best permutation on record is added to the random first population
-def initialized_tournament_selection_search(best_permutation, fname, max_iter, pop_size):
+def tournament_selection_search(fname, max_iter, pop_size, crossover='my_crossover', ls_budget=0, arrays=False, observers=(), profile=False, time_limit=None, max_evals=None, patience=None, cache_size=0, validation='sampled', init='random', diversity=0.5):
     city_locs = load_city_locs(fname)
-    n = len(city_locs)
-    curr_gen = [rand_perm(n) for i in range(pop_size)]
-    curr_gen = [(total_dist(p, city_locs), p) for p in curr_gen]
-    curr_gen.append((total_dist(best_permutation, city_locs), best_permutation))
-    curr_gen.sort()
-    curr_gen = curr_gen[:pop_size]
-    assert len(curr_gen) == pop_size
+    curr_gen = initial_population(city_locs, pop_size, init, diversity)
+    dists = make_distance(city_locs, instance_metric(fname))
 
     print(
         f'tournament_selection_search("{fname}", max_iter={max_iter}, pop_size={pop_size}) ...')
-    for i in range(max_iter):
-        if i % 10 == 0:
-            print(f'Iter {i} being simulated...')
-        # binary tournament selection from top 67% to populate new generation to find parents
-        # parents are then cross-bred
-        # best of current gen is retained, the rest of the population will be offsprings
-
-        top_two_third = [p for p in curr_gen[:int(n*2/3)]]
-        next_gen = []
-        next_gen.append(curr_gen[0][1])
-        for j in range(int(pop_size/2)):
-            s1 = random.choice(top_two_third)
-            s2 = random.choice(top_two_third)
-            if s1[0] < s2[0]:
-                s = s1[1]
-            else:
-                s = s2[1]
-            
-            t1 = random.choice(top_two_third)
-            t2 = random.choice(top_two_third)
-            if t1[0] < t2[0]:
-                t = t1[1]
-            else:
-                t = t2[1]
-            first, second = my_crossover(s,t)
-            next_gen.append(first)
-            next_gen.append(second)            
-
-        next_gen = next_gen[:pop_size]
-        #
-        #  create the next generation of (score, permutations) pairs
-        assert len(next_gen) == pop_size
-        curr_gen = [(total_dist(p, city_locs), p) for p in next_gen]
-        curr_gen.sort()
-
+    ga = Engine(dists, pop_size, crossover=crossover, arrays=arrays,
+                ls_budget=ls_budget, max_iter=max_iter, time_limit=time_limit,
+                max_evals=max_evals, patience=patience, observers=observers,
+                profile=profile, print_every=10, cache_size=cache_size,
+                validation=validation)
+    result = ga.run(curr_gen)
+    print_result(result, pop_size)
+    return result
 
-    print()
-    print(
-        f'After {max_iter} generations of {pop_size} permutations, the best is:')
-    print(f'score = {curr_gen[0][0]}')
-    print(curr_gen[0][1])
-    assert is_good_perm(curr_gen[0][1])
-    return curr_gen[0][1]
 
+# Tournament selection search but the best permutation on record is added to the random first population
+#
+# best_permutation can also be the name of a checkpoint file, in which case
+# the search resumes from it exactly where the checkpointed run left off,
+# and runs until max_iter generations in total.  If checkpoint is given, a
+# checkpoint is written there every checkpoint_every generations and at the
+# end.
+def initialized_tournament_selection_search(best_permutation, fname, max_iter, pop_size, crossover='my_crossover', ls_budget=0, arrays=False, checkpoint=None, checkpoint_every=10, observers=(), profile=False, time_limit=None, max_evals=None, patience=None, cache_size=0, validation='sampled', init='random', diversity=0.5):
+    city_locs = load_city_locs(fname)
+    n = len(city_locs)
+    dists = make_distance(city_locs, instance_metric(fname))
+    ga = Engine(dists, pop_size, crossover=crossover, arrays=arrays,
+                ls_budget=ls_budget, max_iter=max_iter, time_limit=time_limit,
+                max_evals=max_evals, patience=patience, observers=observers,
+                profile=profile, checkpoint=checkpoint,
+                checkpoint_every=checkpoint_every, print_every=10,
+                cache_size=cache_size, validation=validation)
+    if isinstance(best_permutation, str):
+        saved = load_checkpoint(best_permutation)
+        assert saved.tours.shape == (pop_size, n)
+        random.setstate(saved.rng_state)
+        print(
+            f'tournament_selection_search("{fname}", max_iter={max_iter}, pop_size={pop_size}) ...')
+        result = ga.run(saved.tours.tolist(), saved.scores.tolist(),
+                        saved.generation)
+    else:
+        curr_gen = initial_population(city_locs, pop_size, init, diversity)
+        print(
+            f'tournament_selection_search("{fname}", max_iter={max_iter}, pop_size={pop_size}) ...')
+        result = ga.run(curr_gen + [best_permutation])
+    print_result(result, pop_size)
+    return result.best_tour
 
 
 if __name__ == '__main__':
@@ -366,5 +354,8 @@ if __name__ == '__main__':
 491, 563, 768, 773, 328, 703, 95, 477, 416, 257, 874, 730, 513, 535, 860, 220, 973, 413, 897, 464, 901, 577, 830, 957, 148, 382, 15, 633, 650, 613, 794, 65, 8, 778, 140, 584, 637, 774, 596, 853, 447, 887, 528, 811, 367, 891, 260, 56, 47, 873, 375, 799, 452, 114, 780, 686, 261, 499, 487, 420, 739, 752, 115, 351, 343, 354, 256, 889, 103, 23, 371, 911, 264, 244, 320, 558, 22, 141, 82, 134, 157, 940, 904, 294, 360, 644, 718, 183, 777, 682, 286, 875, 116, 122, 321, 174, 867, 237, 441, 585, 942, 716, 609, 538, 835, 449, 335, 423, 68, 847, 518, 102, 138, 766, 936, 586, 968, 525, 483, 800, 681, 909, 262, 943, 69, 803, 578, 144, 31, 964, 630, 996, 215, 632, 307, 248, 575, 379, 956, 500, 772, 5, 747, 815, 883, 979, 906, 695, 469, 41, 820, 927, 310, 900, 530, 455, 460, 569, 693, 965, 701, 952, 149, 253, 
 697, 105, 225, 364, 373, 472, 428, 368, 595, 664, 993, 470, 706, 912, 536, 812, 488, 795, 655, 130, 478, 729, 391, 40, 12, 761, 284, 121, 202, 634, 274, 229, 239, 297, 481, 288, 848, 346, 221, 865, 66, 246, 380, 688, 232, 854, 135, 722, 549, 129, 692, 235, 977, 985, 824, 567, 507, 640, 451, 77, 299, 771, 670, 876, 579, 816, 846, 825, 57, 318, 207, 918, 545, 599, 298, 727, 79, 74, 899, 953, 523, 789, 512, 480, 674, 984, 399, 132, 362, 947, 365, 390, 753, 955, 501, 44, 843, 475, 597, 180, 989, 271, 662, 14, 592, 758, 711, 453, 347, 849, 18, 378, 856, 476, 24, 969, 117, 193, 333, 717, 342, 189, 278, 377, 228, 851, 324, 807, 322, 71, 935, 628, 301, 48, 841, 393, 994, 178, 270, 939, 258, 635, 268, 479, 269, 168, 170, 254, 311, 282, 804, 694, 546, 905, 974, 64, 37, 915, 645, 809, 611, 473, 944, 861, 319, 656, 38, 629, 503, 376, 687, 86, 594, 721, 668, 551, 45, 124, 742, 300, 139, 58, 580, 641, 290, 819, 636, 517, 683, 13, 894, 982, 981, 366, 474, 403, 735, 709, 785, 914, 926, 16, 287, 429, 159, 143, 317, 663, 198, 7, 212, 457, 345, 334, 176, 881, 504, 814, 526, 418, 885, 919, 652, 136, 93, 934, 427, 394, 395, 745, 631, 213, 265, 654, 355, 648, 414, 410, 421, 671, 892, 291, 1, 155, 737, 111, 337, 698, 411, 898, 515, 495, 302, 832, 485, 573, 736, 83, 506, 602, 938, 978, 467, 226, 340, 89, 601, 728, 603, 81, 582, 704, 104, 2, 543, 961, 618, 589, 872, 756, 359, 797, 106, 556, 21, 151, 88, 651, 
 852, 588, 776, 489, 461, 59, 358, 893, 327, 801, 988, 817, 765, 498, 323, 194, 740, 783, 187, 689, 614, 182, 85, 880, 864, 713, 657, 384, 930, 850, 388, 878, 972, 890, 625, 101, 292, 738, 446, 529, 910, 120, 533, 164, 925, 757, 156, 463, 438, 171, 781, 185, 17, 325, 669, 767, 895, 826, 154, 784, 976, 192, 837, 627, 986, 675, 990, 443, 404, 90, 281, 593, 389, 748, 352, 316, 933, 255, 665, 471, 813, 505, 922, 544, 924, 562, 917, 576, 568, 921, 273, 119, 566, 621, 42, 999, 437, 163, 975, 406, 691, 557, 610, 751, 123, 855, 932, 559, 430, 842, 28, 9, 639, 51, 998, 412, 534, 888, 760, 520, 99, 605, 714, 385, 743, 871, 792, 733, 836, 821, 55, 995, 296, 128, 408, 827, 552, 53, 690, 494, 217, 357, 929, 788, 191, 184, 726, 616, 744, 746, 913, 361, 762, 54, 967, 450, 283, 553, 150, 700, 167, 96, 923, 508, 587, 272, 348, 532, 673, 719, 950, 916, 949, 372, 818, 731, 787, 145, 624, 1000, 433, 112, 676, 779, 350, 514, 397, 992, 236, 306, 242, 829, 206, 436, 4, 707, 863, 643, 710, 78, 409, 542, 896, 173, 398, 715, 764, 199, 659, 527, 407, 27, 590, 775, 374, 305, 426, 951, 434, 705, 52, 6, 137, 720, 263, 146, 289, 502, 823, 754, 205, 970, 313, 200, 598, 612, 465, 623, 869, 29, 442, 70, 937, 822, 100, 195, 73, 980, 667, 620, 642, 98, 349, 165, 234, 858, 249, 125, 808, 285, 32, 153, 522, 928, 312, 142, 158, 646, 331, 604, 218, 798, 161, 763, 647, 107, 84, 363, 725, 699, 197, 902, 177, 971, 126, 415, 219, 19, 172, 805, 186, 649, 46, 267, 724, 162, 10, 190, 353, 309, 169, 25, 941, 92, 607, 405, 61, 877, 39, 866, 660, 179, 224, 708, 734, 439, 948, 870, 615, 210, 678, 245, 960, 833, 30, 962, 369, 240, 216, 424, 626, 87, 110, 516, 401, 991, 3, 383, 540, 884, 574, 828, 295]
-    for i in range(100):
-        best_permutation = initialized_tournament_selection_search(best_permutation, 'cities1000.txt', max_iter=100, pop_size=50)
\ No newline at end of file
+#    initialized_tournament_selection_search('cities1000.npz', 'cities1000.txt', max_iter=10000, pop_size=50, checkpoint='cities1000.npz')
+#    for i in range(100):
+#        best_permutation = initialized_tournament_selection_search(best_permutation, 'cities1000.txt', max_iter=100, pop_size=50)
+    from islands import island_search
+    best_permutation = island_search('cities1000.txt', max_iter=1000, pop_size=50, seed_tour=best_permutation)
\ No newline at end of file
@@ -0,0 +1,106 @@
+# validation.py
+
+#
+# Permutation checks for the Traveling Salesman Problem code
+#
+# Tours are checked to be permutations of the city names 1 to n at one of
+# three levels, set per run (see validation_level):
+#
+#     'off'      no checks at all
+#     'sampled'  one in SAMPLE_EVERY checks in the hot loops runs, plus the
+#                one-off checks at the start and end of a search (default)
+#     'full'     every check runs, e.g. in CI
+#
+# A check uses an O(n) bitmap of the cities seen rather than sorting, and
+# a whole population is checked with a few array operations.  Checks raise
+# AssertionError, like the asserts they replace.
+#
+
+import contextlib
+
+import numpy as np
+
+LEVELS = ('off', 'sampled', 'full')
+
+# at the 'sampled' level, one in this many checks runs
+SAMPLE_EVERY = 100
+
+_level = 'sampled'
+_calls = 0
+
+# returns true if lst is a permutation of the ints 1 to len(lst), and false
+# otherwise (including when it holds anything but ints)
+
+
+def is_good_perm(lst):
+    a = np.asarray(lst)
+    n = len(a)
+    if n == 0:
+        return True
+    if a.dtype.kind not in 'iu' or a.min() < 1 or a.max() > n:
+        return False
+    seen = np.zeros(n + 1, dtype=bool)
+    seen[a] = True
+    return bool(seen[1:].all())
+
+# returns true if every row of tours (a 2-D array, or a list of equally long
+# lists) is a permutation of the ints 1 to n, the length of the rows
+
+
+def rows_are_perms(tours):
+    tours = np.asarray(tours)
+    m, n = tours.shape
+    if m == 0 or n == 0:
+        return True
+    if tours.dtype.kind not in 'iu' or tours.min() < 1 or tours.max() > n:
+        return False
+    seen = np.zeros((m, n + 1), dtype=bool)
+    np.put_along_axis(seen, tours.astype(np.intp), True, axis=1)
+    return bool(seen[:, 1:].all())
+
+
+def set_level(level):
+    global _level
+    assert level in LEVELS, f'validation level must be one of {LEVELS}'
+    _level = level
+
+
+def get_level():
+    return _level
+
+# sets the validation level to level for the duration of a with block
+
+
+@contextlib.contextmanager
+def validation_level(level):
+    previous = _level
+    set_level(level)
+    try:
+        yield
+    finally:
+        set_level(previous)
+
+# returns whether a check should run now; with sample=False it is a one-off
+# check, which runs unless validation is off
+
+
+def _due(sample):
+    global _calls
+    if _level == 'off':
+        return False
+    if _level == 'full' or not sample:
+        return True
+    _calls += 1
+    return _calls % SAMPLE_EVERY == 1
+
+
+def check(perm, sample=True):
+    if _due(sample):
+        assert is_good_perm(perm), f'not a permutation: {perm}'
+
+# checks every tour in tours, a 2-D array or a list of permutations
+
+
+def check_rows(tours, sample=True):
+    if _due(sample):
+        assert rows_are_perms(tours), 'population has a bad permutation'